@@ -0,0 +1,163 @@
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, Request
+from .config import (
+    RATE_LIMIT_PER_MIN, RATE_LIMIT_BURST, WHISPER_CONCURRENCY, WHISPER_QUEUE,
+    LLM_CONCURRENCY, LLM_QUEUE
+)
+
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_CLIENTS = 50000
+DISCONNECT_POLL_S = 0.25
+
+
+class RateLimiter:
+    """Per-client token buckets: `rate_per_min` sustained, up to `burst` at once."""
+
+    def __init__(self, rate_per_min: float, burst: int):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self._buckets = OrderedDict()
+        self.rejected = 0
+
+    def check(self, client: str) -> float:
+        """Take one token for client; returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (float(self.burst), now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[client] = (tokens - 1, now)
+            wait = 0.0
+        else:
+            self._buckets[client] = (tokens, now)
+            wait = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+            self.rejected += 1
+        while len(self._buckets) > MAX_TRACKED_CLIENTS:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class ResourceGate:
+    """
+    Bounded admission to an expensive resource (Whisper, LLM).
+
+    At most `concurrency` requests run at once and at most `max_queue` wait;
+    beyond that requests are rejected immediately with 503 and a Retry-After
+    estimated from recent service times. Waiting requests whose client has
+    disconnected leave the queue without running.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self._avg_service_s = 1.0
+
+    def resize(self, concurrency: int):
+        """Change the number of slots; only valid before any request has been admitted."""
+        if self.active or self.waiting:
+            raise RuntimeError(f"Cannot resize {self.name} gate while it is in use")
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_service_s * (self.waiting + 1) / self.concurrency))
+
+    async def _acquire(self, request: Request):
+        acquire = asyncio.ensure_future(self._semaphore.acquire())
+        acquired = False
+        try:
+            while True:
+                done, _ = await asyncio.wait({acquire}, timeout=DISCONNECT_POLL_S)
+                if done:
+                    acquired = True
+                    return
+                if await request.is_disconnected():
+                    self.abandoned += 1
+                    logger.info(f"[{self.name}] client left while queued; dropping request")
+                    raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            if not acquired:
+                # The slot may have been granted while we were checking the client.
+                if acquire.done() and not acquire.cancelled():
+                    self._semaphore.release()
+                else:
+                    acquire.cancel()
+
+    @asynccontextmanager
+    async def admit(self, request: Request):
+        # Counted synchronously: a burst arriving in one tick cannot all slip into the queue
+        # before the semaphore reflects the first admissions.
+        if self.active + self.waiting >= self.concurrency + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"{self.name} is busy, please retry",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+
+        self.waiting += 1
+        try:
+            await self._acquire(request)
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._avg_service_s = 0.8 * self._avg_service_s + 0.2 * (time.monotonic() - started)
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+            "avg_service_s": round(self._avg_service_s, 3),
+        }
+
+
+rate_limiter = RateLimiter(RATE_LIMIT_PER_MIN, RATE_LIMIT_BURST)
+# Sized to the Whisper worker count by routes unless WHISPER_CONCURRENCY is set.
+whisper_gate = ResourceGate("whisper", WHISPER_CONCURRENCY or 1, WHISPER_QUEUE)
+llm_gate = ResourceGate("llm", LLM_CONCURRENCY, LLM_QUEUE)
+
+
+def _client_key(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+async def rate_limit(request: Request):
+    """FastAPI dependency enforcing the per-client token bucket (429 + Retry-After when empty)."""
+    wait = rate_limiter.check(_client_key(request))
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+def get_admission_stats() -> dict:
+    return {
+        "rate_limit": {"per_min": RATE_LIMIT_PER_MIN, "burst": RATE_LIMIT_BURST, "rejected": rate_limiter.rejected},
+        "whisper": whisper_gate.stats(),
+        "llm": llm_gate.stats(),
+    }
@@ -0,0 +1,127 @@
+import math
+from fractions import Fraction
+from functools import lru_cache
+import numpy as np
+
+
+WHISPER_SAMPLE_RATE = 16000
+
+# Rates accepted from clients; all resample to 16 kHz with small, exact filters.
+SUPPORTED_SAMPLE_RATES = (8000, 11025, 16000, 22050, 24000, 32000, 44100, 48000)
+
+# dtype, scale and offset mapping each raw sample format to [-1.0, 1.0).
+SAMPLE_FORMATS = {
+    "s16le": ("<i2", 32768.0, 0.0),
+    "s32le": ("<i4", 2147483648.0, 0.0),
+    "f32le": ("<f4", 1.0, 0.0),
+    "u8": ("u1", 128.0, 128.0),
+}
+
+_ZERO_CROSSINGS = 16
+_KAISER_BETA = 8.6
+# Largest up/down factor: bounds the filter at 2 * 16 * 1000 + 1 taps. Other ratios
+# are approximated by the nearest fraction (below 0.01% rate error for real rates).
+_MAX_RATIO_TERM = 1000
+# Elements gathered per block (outputs x taps per phase), about 16 MB of float32.
+_BLOCK_ELEMENTS = 1 << 22
+
+
+def pcm_to_mono_float(data, channels: int = 1, sample_format: str = "s16le") -> np.ndarray:
+    """
+    Decode interleaved raw PCM into mono float32 in [-1, 1).
+
+    The input buffer is viewed in place (no copy); the only allocation is the
+    float32 output. A trailing partial frame is ignored.
+
+    Args:
+        data: bytes, bytearray or memoryview holding interleaved samples
+        channels: Number of interleaved channels
+        sample_format: One of SAMPLE_FORMATS
+
+    Raises:
+        ValueError: for an unknown sample format or channel count below 1
+    """
+    if sample_format not in SAMPLE_FORMATS:
+        raise ValueError(f"Unsupported sample format '{sample_format}'; expected one of {', '.join(SAMPLE_FORMATS)}")
+    if channels < 1:
+        raise ValueError("channels must be at least 1")
+    dtype, scale, offset = SAMPLE_FORMATS[sample_format]
+    dtype = np.dtype(dtype)
+
+    buffer = memoryview(data).cast("B")
+    usable = len(buffer) - len(buffer) % (dtype.itemsize * channels)
+    samples = np.frombuffer(buffer[:usable], dtype=dtype)
+
+    if channels > 1:
+        mono = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    else:
+        mono = samples.astype(np.float32)
+    if offset:
+        mono -= offset
+    mono /= scale
+    return mono
+
+
+def _ratio(target_sr: int, orig_sr: int):
+    """(up, down) for target_sr / orig_sr, with both terms at most _MAX_RATIO_TERM."""
+    ratio = Fraction(target_sr, orig_sr)
+    inverted = ratio > 1
+    if inverted:
+        ratio = 1 / ratio
+    # ratio <= 1 here, so bounding the denominator bounds the numerator too.
+    ratio = ratio.limit_denominator(_MAX_RATIO_TERM) or Fraction(1, _MAX_RATIO_TERM)
+    if inverted:
+        ratio = 1 / ratio
+    return ratio.numerator, ratio.denominator
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int):
+    """Kaiser-windowed sinc low-pass split into `up` phases: shape (up, taps_per_phase)."""
+    factor = max(up, down)
+    length = 2 * _ZERO_CROSSINGS * factor + 1
+    cutoff = 1.0 / factor
+    n = np.arange(length) - (length - 1) / 2.0
+    h = up * cutoff * np.sinc(cutoff * n) * np.kaiser(length, _KAISER_BETA)
+    taps = math.ceil(length / up)
+    padded = np.zeros(taps * up)
+    padded[:length] = h
+    # Row p holds h[p], h[p + up], h[p + 2*up], ...
+    return padded.reshape(taps, up).T.astype(np.float32), (length - 1) // 2
+
+
+def resample(x: np.ndarray, orig_sr: int, target_sr: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample a mono float32 signal by the rational factor target_sr / orig_sr.
+
+    Polyphase FIR: only the output samples are computed, each as a dot product
+    of the input window with one filter phase, vectorised over blocks of outputs.
+    Ratios whose reduced terms exceed 1000 are approximated, keeping the filter
+    (and its cache entry) bounded whatever rates are passed in.
+    """
+    if orig_sr <= 0 or target_sr <= 0:
+        raise ValueError("Sample rates must be positive")
+    up, down = _ratio(target_sr, orig_sr)
+    x = np.asarray(x, dtype=np.float32)
+    if up == down or x.size == 0:
+        return x
+
+    phases, delay = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+    padded = np.concatenate([np.zeros(taps, np.float32), x, np.zeros(taps + delay // up + 1, np.float32)])
+    n_out = math.ceil(x.size * up / down)
+    out = np.empty(n_out, dtype=np.float32)
+    back = np.arange(taps)
+    block = max(1, _BLOCK_ELEMENTS // taps)
+
+    for start in range(0, n_out, block):
+        m = np.arange(start, min(start + block, n_out))
+        t = m * down + delay
+        window = padded[(t // up + taps)[:, None] - back[None, :]]
+        out[start:start + m.size] = np.einsum("ij,ij->i", window, phases[t % up])
+    return out
+
+
+def to_whisper_input(data, sample_rate: int, channels: int = 1, sample_format: str = "s16le") -> np.ndarray:
+    """Convert raw PCM of any supported rate/layout to the 16 kHz mono float32 Whisper expects."""
+    return resample(pcm_to_mono_float(data, channels, sample_format), sample_rate, WHISPER_SAMPLE_RATE)
@@ -1,45 +1,240 @@
 import io
 import tempfile
 import logging
-from typing import Optional
-from faster_whisper import WhisperModel
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Iterator, List, Optional, Union
+from faster_whisper import WhisperModel, decode_audio as decode_audio_file
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+import av
 import soundfile as sf
 import numpy as np
+from .config import (
+    WHISPER_AUTOTUNE, WHISPER_LANGUAGE, LANGUAGE_PIN_MIN_PROBABILITY,
+    LANGUAGE_REDETECT_LOGPROB, LANGUAGE_SESSIONS_MAX, MAX_CLIP_SECONDS
+)
+from .audio_tuning import DEFAULT_CONFIG, load_tuning, calibrate, save_tuning
+from .profiling import span
+from .audio_dsp import to_whisper_input, resample, WHISPER_SAMPLE_RATE, SUPPORTED_SAMPLE_RATES
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pauses at least this long split a clip into separately transcribed speech chunks.
+VAD_MIN_SILENCE_MS = 300
+VAD_SPEECH_PAD_MS = 150
+
+# One transcribed speech chunk, shaped like a faster-whisper segment for Transcription.
+ChunkText = namedtuple("ChunkText", ["text", "avg_logprob"])
+
+
+def speech_chunks(audio: np.ndarray) -> List[np.ndarray]:
+    """Split 16 kHz mono samples at pauses into speech chunks using Silero VAD."""
+    options = VadOptions(min_silence_duration_ms=VAD_MIN_SILENCE_MS, speech_pad_ms=VAD_SPEECH_PAD_MS)
+    return [audio[t["start"]:t["end"]] for t in get_speech_timestamps(audio, options)]
+
+
+def _chunk_text(segments) -> Optional[ChunkText]:
+    segments = list(segments)
+    if not segments:
+        return None
+    text = " ".join(s.text.strip() for s in segments if s.text.strip())
+    return ChunkText(text, sum(s.avg_logprob for s in segments) / len(segments))
+
+class LanguageSessions:
+    """Per-session pinned transcription language (least recently used sessions are evicted)."""
+
+    def __init__(self, max_sessions: int = LANGUAGE_SESSIONS_MAX):
+        self.max_sessions = max_sessions
+        self._pins = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str]) -> Optional[str]:
+        if not session_id:
+            return None
+        with self._lock:
+            language = self._pins.get(session_id)
+            if language is not None:
+                self._pins.move_to_end(session_id)
+            return language
+
+    def pin(self, session_id: Optional[str], language: str):
+        if not session_id:
+            return
+        with self._lock:
+            self._pins[session_id] = language
+            self._pins.move_to_end(session_id)
+            while len(self._pins) > self.max_sessions:
+                self._pins.popitem(last=False)
+
+    def unpin(self, session_id: Optional[str]):
+        if not session_id:
+            return
+        with self._lock:
+            self._pins.pop(session_id, None)
+
+
+class Transcription:
+    """
+    Lazily decoded transcription. Iterating yields non-empty segment texts as
+    Whisper produces them; `language` is known before the first segment.
+    """
+
+    def __init__(self, segments, language: str, pinned: bool, session_id: Optional[str], sessions: LanguageSessions):
+        self.language = language
+        self._segments = segments
+        self._pinned = pinned
+        self._session_id = session_id
+        self._sessions = sessions
+
+    def __iter__(self) -> Iterator[str]:
+        logprobs = []
+        for segment in self._segments:
+            logprobs.append(segment.avg_logprob)
+            text = segment.text.strip()
+            if text:
+                yield text
+        # A pinned language that decodes poorly may be wrong now (e.g. the user switched
+        # languages); drop the pin so the next clip is detected again.
+        if self._pinned and logprobs and sum(logprobs) / len(logprobs) < LANGUAGE_REDETECT_LOGPROB:
+            logger.info(f"Low confidence with pinned language '{self.language}'; re-detecting on next clip")
+            self._sessions.unpin(self._session_id)
+
+    def text(self) -> str:
+        with span("whisper.transcribe"):
+            return " ".join(self).strip()
+
+
 class AudioService:
-    def __init__(self, model_size: str = "small"):
+    def __init__(self, model_size: str = "small", compute_type: str = "int8",
+                 cpu_threads: int = 0, num_workers: int = 1):
         """
         Initialize the audio service with Faster-Whisper.
         
         Args:
             model_size: Whisper model size ('tiny', 'base', 'small', 'medium', 'large')
+            compute_type: CTranslate2 compute type ('int8', 'int8_float32', ...)
+            cpu_threads: Threads per transcription (0 lets CTranslate2 decide)
+            num_workers: Number of transcriptions that may run in parallel
         """
         self.model_size = model_size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
         self.model = None
+        self.sessions = LanguageSessions()
         self._load_model()
     
     def _load_model(self):
         """Load the Whisper model."""
         try:
-            logger.info(f"Loading Faster-Whisper model: {self.model_size}")
+            logger.info(f"Loading Faster-Whisper model: {self.model_size} "
+                        f"(compute_type={self.compute_type}, cpu_threads={self.cpu_threads}, num_workers={self.num_workers})")
            
-            self.model = WhisperModel(self.model_size, device="cpu", compute_type="int8")
+            self.model = WhisperModel(
+                self.model_size,
+                device="cpu",
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+                num_workers=self.num_workers
+            )
             logger.info("Model loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
     
-    def transcribe_audio(self, audio_data: bytes, sample_rate: int = 16000) -> Optional[str]:
+    def start_transcription(self, audio: Union[str, np.ndarray], session_id: Optional[str] = None) -> Transcription:
+        """
+        Begin transcribing audio, choosing the language for the session.
+
+        With WHISPER_LANGUAGE=auto, the first clip of a session is language-detected
+        and, if detection is confident enough, the language is pinned so later clips
+        skip detection. Otherwise WHISPER_LANGUAGE is used for every clip.
+
+        Args:
+            audio: Path to an audio file, or 16 kHz mono float32 samples
+            session_id: Client session identifier (optional)
+
+        Returns:
+            Transcription to iterate for segment texts
+        """
+        segments, language, pinned = self._begin(audio, session_id)
+        return Transcription(segments, language, pinned, session_id, self.sessions)
+
+    def _begin(self, audio, session_id: Optional[str]):
+        if self.model is None:
+            raise RuntimeError("Model not loaded")
+
+        auto = WHISPER_LANGUAGE == "auto"
+        language = self.sessions.get(session_id) if auto else WHISPER_LANGUAGE
+        segments, info = self.model.transcribe(
+            audio,
+            beam_size=5,
+            language=language,
+            condition_on_previous_text=False
+        )
+        pinned = language is not None and auto
+        if language is None:
+            language = info.language
+            if info.language_probability >= LANGUAGE_PIN_MIN_PROBABILITY:
+                self.sessions.pin(session_id, language)
+            logger.info(f"Detected language '{language}' (p={info.language_probability:.2f})")
+        return segments, language, pinned
+
+    def start_chunked_transcription(self, audio: Union[str, np.ndarray], session_id: Optional[str] = None) -> Transcription:
+        """
+        Begin transcribing audio one speech chunk at a time.
+
+        The clip is split at pauses (VAD) and each chunk is decoded separately, so
+        iterating yields one text per chunk as soon as that chunk is decoded,
+        before later chunks have been. Whisper itself only yields segments after
+        decoding a whole 30 s window, which covers any short voice command.
+        Each chunk costs its own encoder pass, so this trades compute for earlier
+        partial text.
+
+        Args:
+            audio: Path to an audio file, or 16 kHz mono float32 samples
+            session_id: Client session identifier (optional)
+
+        Returns:
+            Transcription yielding one text per speech chunk
         """
-        Transcribe audio data to text using Faster-Whisper.
+        if isinstance(audio, str):
+            audio = decode_audio_file(audio, sampling_rate=WHISPER_SAMPLE_RATE)
+        chunks = speech_chunks(audio)
+        if len(chunks) <= 1:
+            return self.start_transcription(chunks[0] if chunks else audio, session_id)
+
+        first, language, pinned = self._begin(chunks[0], session_id)
+
+        def chunk_texts():
+            chunk = _chunk_text(first)
+            if chunk:
+                yield chunk
+            for samples in chunks[1:]:
+                segments, _info = self.model.transcribe(
+                    samples, beam_size=5, language=language, condition_on_previous_text=False
+                )
+                chunk = _chunk_text(segments)
+                if chunk:
+                    yield chunk
+
+        return Transcription(chunk_texts(), language, pinned, session_id, self.sessions)
+
+    def transcribe_audio(self, audio_data: bytes, sample_rate: int = 16000, channels: int = 1,
+                         sample_format: str = "s16le", session_id: Optional[str] = None) -> Optional[str]:
+        """
+        Transcribe raw PCM audio to text using Faster-Whisper.
+        
+        The samples are downmixed to mono and resampled to 16 kHz as needed.
         
         Args:
-            audio_data: Raw audio data as bytes
+            audio_data: Raw interleaved PCM samples as bytes
             sample_rate: Sample rate of the audio (default: 16000)
+            channels: Number of interleaved channels (default: 1)
+            sample_format: 's16le', 's32le', 'f32le' or 'u8' (default: 's16le')
+            session_id: Client session used for language pinning (optional)
             
         Returns:
             Transcribed text or None if transcription fails
@@ -50,26 +245,10 @@ class AudioService:
                 return None
             
             
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
-            
-           
-            audio_float = audio_array.astype(np.float32) / 32768.0
+            audio_float = to_whisper_input(audio_data, sample_rate, channels, sample_format)
             
             
-            segments, info = self.model.transcribe(
-                audio_float,
-                beam_size=5,
-                language="en",  
-                condition_on_previous_text=False
-            )
-            
-            
-            transcribed_text = ""
-            for segment in segments:
-                transcribed_text += segment.text
-            
-            
-            transcribed_text = transcribed_text.strip()
+            transcribed_text = self.start_transcription(audio_float, session_id).text()
             
             if transcribed_text:
                 logger.info(f"Transcription successful: {transcribed_text}")
@@ -82,12 +261,13 @@ class AudioService:
             logger.error(f"Transcription failed: {e}")
             return None
     
-    def transcribe_audio_file(self, file_path: str) -> Optional[str]:
+    def transcribe_audio_file(self, file_path: str, session_id: Optional[str] = None) -> Optional[str]:
         """
         Transcribe audio from a file.
         
         Args:
             file_path: Path to the audio file
+            session_id: Client session used for language pinning (optional)
             
         Returns:
             Transcribed text or None if transcription fails
@@ -98,20 +278,7 @@ class AudioService:
                 return None
             
            
-            segments, info = self.model.transcribe(
-                file_path,
-                beam_size=5,
-                language="en",
-                condition_on_previous_text=False
-            )
-            
-           
-            transcribed_text = ""
-            for segment in segments:
-                transcribed_text += segment.text
-            
-           
-            transcribed_text = transcribed_text.strip()
+            transcribed_text = self.start_transcription(file_path, session_id).text()
             
             if transcribed_text:
                 logger.info(f"Transcription successful: {transcribed_text}")
@@ -125,7 +292,74 @@ class AudioService:
             return None
 
 
-audio_service = AudioService(model_size="small")  
+def _check_clip(sample_rate: int, seconds: Optional[float]):
+    if sample_rate not in SUPPORTED_SAMPLE_RATES:
+        raise ValueError(f"Unsupported sample rate {sample_rate} Hz; use one of "
+                         f"{', '.join(map(str, SUPPORTED_SAMPLE_RATES))}")
+    if seconds is not None and seconds > MAX_CLIP_SECONDS:
+        raise ValueError(f"Clip is {seconds:.0f} s long; at most {MAX_CLIP_SECONDS:.0f} s is accepted")
+
+
+def _probe_container(data: bytes):
+    """(sample_rate, duration in seconds or None) of the first audio stream, read with PyAV."""
+    with av.open(io.BytesIO(data)) as container:
+        stream = container.streams.audio[0]
+        duration = container.duration / av.time_base if container.duration else None
+        return stream.sample_rate, duration
+
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """
+    Decode an encoded clip in memory to 16 kHz mono float32.
+
+    WAV/FLAC/Ogg are read with libsndfile and resampled here; anything else
+    (mp3, m4a, ...) is decoded with PyAV. The header is checked before decoding:
+    the sample rate must be one of SUPPORTED_SAMPLE_RATES and the clip at most
+    MAX_CLIP_SECONDS long.
+
+    Raises:
+        ValueError: if the clip cannot be decoded or fails those checks
+    """
+    with span("audio.decode"):
+        try:
+            info = sf.info(io.BytesIO(data))
+        except Exception:
+            info = None
+
+        if info is not None:
+            _check_clip(info.samplerate, info.frames / info.samplerate if info.samplerate else None)
+            samples, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+            mono = samples.mean(axis=1, dtype=np.float32) if samples.shape[1] > 1 else samples[:, 0]
+            return resample(mono, sample_rate, WHISPER_SAMPLE_RATE)
+
+        try:
+            sample_rate, duration = _probe_container(data)
+        except Exception as e:
+            raise ValueError(f"Unsupported or corrupt audio: {e}")
+        _check_clip(sample_rate, duration)
+        audio = decode_audio_file(io.BytesIO(data), sampling_rate=WHISPER_SAMPLE_RATE)
+        # Container durations can be missing or wrong; check what was actually decoded.
+        _check_clip(sample_rate, len(audio) / WHISPER_SAMPLE_RATE)
+        return audio
+
+
+def _startup_config() -> dict:
+    """Use the persisted calibration, running it first if autotuning is enabled."""
+    tuning = load_tuning()
+    if tuning is None and WHISPER_AUTOTUNE:
+        logger.info("No Whisper tuning found; calibrating (WHISPER_AUTOTUNE is set)")
+        try:
+            tuning = calibrate()
+            save_tuning(tuning)
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"Whisper autotuning skipped, using defaults: {e}")
+    config = dict(DEFAULT_CONFIG)
+    if tuning:
+        config.update({k: tuning[k] for k in DEFAULT_CONFIG if k in tuning})
+    return config
+
+
+audio_service = AudioService(**_startup_config())
 
 def get_audio_service() -> AudioService:
     """Get the global audio service instance."""
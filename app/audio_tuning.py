@@ -0,0 +1,223 @@
+"""
+Whisper configuration autotuning.
+
+Benchmarks candidate model sizes, compute types and cpu_threads/num_workers on a
+reference speech clip, keeps the best configuration that meets the target
+real-time factor (processing time / audio duration) and persists it for
+AudioService.
+
+The clip must be real speech representative of the app's traffic: decoding
+time follows the number of tokens Whisper emits, so a non-speech signal
+measures little and would favour oversized models.
+
+Run as a CLI:
+    python -m app.audio_tuning [--rtf 0.5] [--clip path/to/clip.wav]
+or set WHISPER_AUTOTUNE=1 to calibrate at startup when no tuning file exists.
+"""
+
+import os
+import json
+import sys
+import time
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+import soundfile as sf
+from faster_whisper import WhisperModel
+from .config import WHISPER_TARGET_RTF as TARGET_RTF
+from .audio_dsp import resample
+
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+TUNING_FILE = PROJECT_ROOT / "data" / "whisper_tuning.json"
+REFERENCE_CLIP = PROJECT_ROOT / "data" / "calibration.wav"
+
+# Ordered from most to least accurate; the first size that meets the target wins.
+CANDIDATE_MODELS = ["medium", "small", "base", "tiny"]
+CANDIDATE_COMPUTE_TYPES = ["int8", "int8_float32"]
+DEFAULT_CONFIG = {"model_size": "small", "compute_type": "int8", "cpu_threads": 0, "num_workers": 1}
+MIN_CLIP_SECONDS = 3
+
+
+def _thread_candidates():
+    cores = os.cpu_count() or 1
+    candidates = {1, 2, 4, 8, cores // 2, cores}
+    return sorted(c for c in candidates if 1 <= c <= cores)
+
+
+def _worker_candidates(cpu_threads: int):
+    """num_workers values worth trying alongside cpu_threads without oversubscribing the cores."""
+    cores = os.cpu_count() or 1
+    most = max(1, cores // max(cpu_threads, 1))
+    return sorted({w for w in (1, 2, 4, 8, most) if 1 <= w <= most})
+
+
+def _reference_audio(clip_path: Optional[Path] = None):
+    """
+    Load the reference speech clip as 16 kHz mono float32.
+
+    Raises:
+        FileNotFoundError: if the clip does not exist
+        ValueError: if the clip is shorter than MIN_CLIP_SECONDS
+    """
+    path = Path(clip_path) if clip_path else REFERENCE_CLIP
+    if not path.exists():
+        raise FileNotFoundError(f"Reference speech clip {path} not found; record a few seconds of "
+                                f"representative speech there (or pass --clip)")
+    data, sample_rate = sf.read(str(path), dtype="float32", always_2d=True)
+    audio = resample(data.mean(axis=1), sample_rate, 16000)
+    if len(audio) < MIN_CLIP_SECONDS * 16000:
+        raise ValueError(f"Reference clip {path} is shorter than {MIN_CLIP_SECONDS} s")
+    return audio
+
+
+def _transcribe_once(model, audio) -> float:
+    start = time.perf_counter()
+    segments, _info = model.transcribe(audio, beam_size=5, language="en", condition_on_previous_text=False)
+    list(segments)
+    return time.perf_counter() - start
+
+
+def _measure(audio, model_size, compute_type, cpu_threads, num_workers=1, repeats=2):
+    """
+    Run num_workers concurrent transcriptions of the clip, repeats times.
+
+    Returns:
+        (rtf, throughput): the slowest stream's real-time factor in the best round,
+        and audio seconds transcribed per wall-clock second in that round
+    """
+    model = WhisperModel(model_size, device="cpu", compute_type=compute_type,
+                         cpu_threads=cpu_threads, num_workers=num_workers)
+    duration = len(audio) / 16000
+    # Warm-up pass so one-off allocation cost is not counted.
+    _transcribe_once(model, audio)
+    best_rtf, best_throughput = float("inf"), 0.0
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            elapsed = list(pool.map(lambda _: _transcribe_once(model, audio), range(num_workers)))
+            wall = time.perf_counter() - start
+            best_rtf = min(best_rtf, max(elapsed) / duration)
+            best_throughput = max(best_throughput, num_workers * duration / wall)
+    return best_rtf, best_throughput
+
+
+def calibrate(target_rtf: float = TARGET_RTF, clip_path: Optional[Path] = None,
+              models=None, compute_types=None) -> dict:
+    """
+    Benchmark candidate configurations and return the best one meeting target_rtf.
+
+    First, single-stream runs pick the most accurate model size that meets the
+    target and, within it, the fastest compute type and cpu_threads. Then
+    cpu_threads/num_workers combinations are benchmarked with num_workers
+    concurrent streams, and the one with the highest throughput whose slowest
+    stream still meets the target is kept. If nothing meets the target, the
+    fastest single-stream configuration is returned.
+
+    Raises:
+        FileNotFoundError / ValueError: if there is no usable reference speech clip
+
+    Returns:
+        dict with model_size, compute_type, cpu_threads, num_workers, the measured
+        rtf and throughput (audio seconds per second), plus the machine's cpu_count
+        and the candidates tried
+    """
+    audio = _reference_audio(clip_path)
+    models = list(models or CANDIDATE_MODELS)
+    compute_types = list(compute_types or CANDIDATE_COMPUTE_TYPES)
+    # Recorded with the result: a tuning only applies to machines with this core count.
+    measured_on = {"cpu_count": os.cpu_count(), "candidate_models": models,
+                   "candidate_compute_types": compute_types, "target_rtf": target_rtf}
+    results = []
+    for model_size in models:
+        for compute_type in compute_types:
+            for cpu_threads in _thread_candidates():
+                try:
+                    rtf, throughput = _measure(audio, model_size, compute_type, cpu_threads)
+                except Exception as e:
+                    logger.warning(f"Skipping {model_size}/{compute_type}: {e}")
+                    break
+                logger.info(f"{model_size} {compute_type} cpu_threads={cpu_threads}: rtf={rtf:.3f}")
+                results.append({"model_size": model_size, "compute_type": compute_type,
+                                "cpu_threads": cpu_threads, "num_workers": 1,
+                                "rtf": rtf, "throughput": throughput})
+        if any(r["model_size"] == model_size and r["rtf"] <= target_rtf for r in results):
+            break
+
+    if not results:
+        return {**DEFAULT_CONFIG, **measured_on}
+    meeting = [r for r in results if r["rtf"] <= target_rtf]
+    if not meeting:
+        best = min(results, key=lambda r: r["rtf"])
+        return {**best, **measured_on}
+    best_size = meeting[0]["model_size"]
+    best = min((r for r in meeting if r["model_size"] == best_size), key=lambda r: r["rtf"])
+
+    # Concurrent streams: trade threads per transcription for parallel transcriptions.
+    combos = [best]
+    for cpu_threads in _thread_candidates():
+        for num_workers in _worker_candidates(cpu_threads):
+            if num_workers == 1:
+                continue
+            try:
+                rtf, throughput = _measure(audio, best["model_size"], best["compute_type"], cpu_threads, num_workers)
+            except Exception as e:
+                logger.warning(f"Skipping cpu_threads={cpu_threads} num_workers={num_workers}: {e}")
+                continue
+            logger.info(f"{best['model_size']} {best['compute_type']} cpu_threads={cpu_threads} "
+                        f"num_workers={num_workers}: rtf={rtf:.3f} throughput={throughput:.2f}x")
+            combos.append({**best, "cpu_threads": cpu_threads, "num_workers": num_workers,
+                           "rtf": rtf, "throughput": throughput})
+
+    best = max((c for c in combos if c["rtf"] <= target_rtf), key=lambda c: (c["throughput"], -c["rtf"]))
+    return {**best, **measured_on}
+
+
+def save_tuning(config: dict, path: Path = TUNING_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+
+def load_tuning(path: Path = TUNING_FILE) -> Optional[dict]:
+    """
+    Return the persisted tuning, or None if calibration has not been run on a
+    machine like this one (a tuning measured with a different CPU count is ignored).
+    """
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tuning = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable Whisper tuning file {path}: {e}")
+        return None
+    if tuning.get("cpu_count") != os.cpu_count():
+        logger.warning(f"Ignoring Whisper tuning file {path}: measured on {tuning.get('cpu_count')} "
+                       f"cores, this machine has {os.cpu_count()}")
+        return None
+    return tuning
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper configurations and persist the best one.")
+    parser.add_argument("--rtf", type=float, default=TARGET_RTF, help="Target real-time factor (default: %(default)s)")
+    parser.add_argument("--clip", type=Path, default=None, help="Reference speech clip (default: data/calibration.wav)")
+    parser.add_argument("--models", nargs="+", default=None, help="Model sizes to try, most accurate first")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        config = calibrate(args.rtf, args.clip, models=args.models)
+    except (FileNotFoundError, ValueError) as e:
+        sys.exit(str(e))
+    save_tuning(config)
+    print(json.dumps(config, indent=2))
+
+
+if __name__ == "__main__":
+    main()
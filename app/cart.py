@@ -1,9 +1,21 @@
+import os
 import json
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from .products import find_product_by_name
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 PROJECT_ROOT = Path(__file__).parent.parent
 CART_FILE = PROJECT_ROOT / "carts.json"
+LOCK_FILE = PROJECT_ROOT / "carts.json.lock"
+MAX_ITEM_QUANTITY = 99
 
 
 if not CART_FILE.exists():
@@ -23,24 +35,119 @@ def _read_cart():
                 json.dump([], wf)
             return []
 
+_thread_lock = threading.Lock()
+
+@contextmanager
+def _cart_lock():
+    """
+    Serialize read-modify-write cycles on the cart file.
+
+    The thread lock covers one process; the fcntl lock on carts.json.lock covers
+    several uvicorn workers. Without fcntl (Windows) only a single worker is safe.
+    """
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(LOCK_FILE, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
 def _write_cart(cart_data):
-    with open(CART_FILE, "w", encoding="utf-8") as f:
-        json.dump(cart_data, f, indent=2)
+    # Write to a unique sibling file and rename so readers never see a half-written cart.
+    fd, tmp_file = tempfile.mkstemp(dir=CART_FILE.parent, prefix=".carts-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cart_data, f, indent=2)
+        os.replace(tmp_file, CART_FILE)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
 
 def add_to_cart(item: dict):
-    cart = _read_cart()
-    cart.append(item)
-    _write_cart(cart)
+    with _cart_lock():
+        cart = _read_cart()
+        cart.append(item)
+        _write_cart(cart)
 
 def remove_from_cart(name: str) -> bool:
-    cart = _read_cart()
-    initial_len = len(cart)
-    cart = [i for i in cart if i.get("name", "").lower() != name.lower()]
-    _write_cart(cart)
+    with _cart_lock():
+        cart = _read_cart()
+        initial_len = len(cart)
+        cart = [i for i in cart if i.get("name", "").lower() != name.lower()]
+        _write_cart(cart)
     return len(cart) < initial_len
 
 def get_cart():
     return _read_cart()
 
 def clear_cart():
-    _write_cart([])
+    with _cart_lock():
+        _write_cart([])
+
+def apply_cart_operations(operations: list) -> list:
+    """
+    Apply a list of cart operations atomically with a single storage write.
+
+    Each operation is a dict {"op": "add"|"remove"|"set", "name": str, "quantity": int | None}:
+      - add: add `quantity` units (default 1)
+      - remove: remove `quantity` units, or every unit of the item when quantity is None
+      - set: make the cart hold exactly `quantity` units (0 removes the item)
+
+    All operations are validated first; if any is invalid nothing is written.
+    No item may end up with more than MAX_ITEM_QUANTITY units.
+
+    Returns:
+        The updated cart list
+
+    Raises:
+        ValueError: if an operation is malformed or names an unknown product
+    """
+    resolved = []
+    for index, operation in enumerate(operations):
+        op = (operation.get("op") or "").strip().lower()
+        if op not in ("add", "remove", "set"):
+            raise ValueError(f"Operation {index}: unknown op '{operation.get('op')}'")
+        product = find_product_by_name(operation.get("name") or "")
+        if product is None:
+            raise ValueError(f"Operation {index}: '{operation.get('name')}' is not in the catalog")
+        quantity = operation.get("quantity")
+        if quantity is None and op == "add":
+            quantity = 1
+        if op == "set" and quantity is None:
+            raise ValueError(f"Operation {index}: set requires a quantity")
+        if quantity is not None and (not isinstance(quantity, int) or not 0 <= quantity <= MAX_ITEM_QUANTITY):
+            raise ValueError(f"Operation {index}: quantity must be an integer between 0 and {MAX_ITEM_QUANTITY}")
+        resolved.append((op, product["name"], quantity))
+
+    with _cart_lock():
+        cart = _read_cart()
+        for index, (op, name, quantity) in enumerate(resolved):
+            key = name.lower()
+            held = sum(1 for i in cart if (i.get("name") or "").strip().lower() == key)
+            if op == "add":
+                target = held + quantity
+            elif op == "remove":
+                target = 0 if quantity is None else max(held - quantity, 0)
+            else:
+                target = quantity
+            if target > MAX_ITEM_QUANTITY:
+                raise ValueError(f"Operation {index}: at most {MAX_ITEM_QUANTITY} units of '{name}' per cart")
+
+            if target < held:
+                to_drop = held - target
+                kept = []
+                # Drop the most recently added units first.
+                for entry in reversed(cart):
+                    if to_drop and (entry.get("name") or "").strip().lower() == key:
+                        to_drop -= 1
+                        continue
+                    kept.append(entry)
+                cart = kept[::-1]
+            elif target > held:
+                cart.extend({"name": name} for _ in range(target - held))
+        _write_cart(cart)
+    return cart
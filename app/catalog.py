@@ -0,0 +1,207 @@
+import json
+import gzip
+import base64
+import hashlib
+from functools import lru_cache
+from typing import Optional
+from .products import get_all_products, CATALOG_VERSION
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MAX_PAGE_SIZE = 1000
+MIN_COMPRESS_BYTES = 1024
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def dumps(data) -> bytes:
+    """Serialize to compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _filter_key(category: Optional[str], min_price: Optional[float], max_price: Optional[float]) -> str:
+    """Short digest of a filter set; cursors are only valid for the filters they were issued under."""
+    raw = f"{category or ''}|{min_price!r}|{max_price!r}".encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def _encode_cursor(offset: int, filters: str) -> str:
+    raw = f"{CATALOG_VERSION}:{filters}:{offset}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, filters: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, cursor_filters, offset = base64.urlsafe_b64decode(padded).decode("ascii").split(":")
+        offset = int(offset)
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if version != CATALOG_VERSION:
+        raise InvalidCursor("Cursor belongs to an older catalog version; restart pagination")
+    if cursor_filters != filters:
+        raise InvalidCursor("Cursor was issued for different filters; restart pagination")
+    if offset < 0:
+        raise InvalidCursor("Malformed cursor")
+    return offset
+
+
+def _filtered(category: Optional[str], min_price: Optional[float], max_price: Optional[float]):
+    """Yield (category, item) pairs in catalog order that pass the filters."""
+    wanted = category.strip().lower() if category else None
+    for cat, items in get_all_products().items():
+        if wanted and cat.lower() != wanted:
+            continue
+        for item in items:
+            price = float(item.get("price", 0) or 0)
+            if min_price is not None and price < min_price:
+                continue
+            if max_price is not None and price > max_price:
+                continue
+            yield cat, item
+
+
+def _grouped(pairs, dropdown: bool):
+    grouped = {}
+    for cat, item in pairs:
+        if dropdown:
+            item = {"name": item.get("name"), "price": item.get("price"), "unit": item.get("unit")}
+        grouped.setdefault(cat, []).append(item)
+    if dropdown:
+        return [{"category": cat, "items": items} for cat, items in grouped.items()]
+    return grouped
+
+
+def _known_category(category: Optional[str]) -> bool:
+    return category is None or any(cat.lower() == category for cat in get_all_products())
+
+
+@lru_cache(maxsize=64)
+def _category_pairs(version: str, category: Optional[str]):
+    """Catalog-order (category, item) pairs for one category (or all); keyed by real categories only."""
+    return tuple(_filtered(category, None, None))
+
+
+def _build(version: str, view: str, pairs, offset: int, limit: Optional[int], filters: str):
+    dropdown = view == "dropdown"
+    if limit is None:
+        grouped = _grouped(pairs, dropdown)
+        body = {"categories": grouped} if dropdown else grouped
+    else:
+        page = pairs[offset:offset + limit]
+        end = offset + len(page)
+        body = {
+            "categories": _grouped(page, dropdown),
+            "next_cursor": _encode_cursor(end, filters) if end < len(pairs) else None,
+        }
+    payload = dumps(body)
+    etag = f'W/"{version}-{hashlib.sha1(payload).hexdigest()[:16]}"'
+    return payload, etag
+
+
+@lru_cache(maxsize=64)
+def _full_body(version: str, view: str, category: Optional[str]):
+    """Whole-catalog or single-category body; the only bodies kept in memory."""
+    return _build(version, view, _category_pairs(version, category), 0, None, _filter_key(category, None, None))
+
+
+@lru_cache(maxsize=128)
+def _compressed(version: str, view: str, category: Optional[str], encoding: str) -> bytes:
+    payload, _ = _full_body(version, view, category)
+    return _compress(payload, encoding)
+
+
+def _compress(payload: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(payload, quality=5)
+    return gzip.compress(payload, compresslevel=6)
+
+
+def catalog_body(view: str, category: Optional[str] = None, min_price: Optional[float] = None,
+                 max_price: Optional[float] = None, cursor: Optional[str] = None,
+                 limit: Optional[int] = None):
+    """
+    Return the pre-serialized JSON body and ETag for a catalog view.
+
+    Unfiltered and per-category bodies are built once per catalog version and
+    served from memory; price-filtered bodies and pages are built per request
+    (pages reuse the cached per-category item list). Cursors are bound to the
+    catalog version and the filter set they were issued for.
+
+    Args:
+        view: 'items' (grouped product dicts) or 'dropdown' (name/price/unit)
+        category: Only include this category (case-insensitive)
+        min_price: Only include items priced at or above this
+        max_price: Only include items priced at or below this
+        cursor: Opaque cursor from a previous page's next_cursor
+        limit: Page size; when omitted the whole (filtered) catalog is returned
+
+    Returns:
+        (payload bytes, etag, cache key); pass the key to encode_body so compressed
+        copies of cached bodies are reused. It is None for uncached bodies.
+    """
+    category = category.strip().lower() if category else None
+    filters = _filter_key(category, min_price, max_price)
+    offset = _decode_cursor(cursor, filters) if cursor else 0
+    if cursor and limit is None:
+        limit = MAX_PAGE_SIZE
+    if limit is not None:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    unfiltered = min_price is None and max_price is None
+    if unfiltered and limit is None and _known_category(category):
+        key = (CATALOG_VERSION, view, category)
+        payload, etag = _full_body(*key)
+        return payload, etag, key
+
+    if unfiltered and _known_category(category):
+        pairs = _category_pairs(CATALOG_VERSION, category)
+    else:
+        pairs = list(_filtered(category, min_price, max_price))
+    payload, etag = _build(CATALOG_VERSION, view, pairs, offset, limit, filters)
+    return payload, etag, None
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported content coding from an Accept-Encoding header."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def encode_body(payload: bytes, encoding: Optional[str], cache_key=None) -> bytes:
+    """Return payload compressed with the given coding, or as-is; cached bodies reuse their compressed copy."""
+    if encoding is None or len(payload) < MIN_COMPRESS_BYTES:
+        return payload
+    if cache_key is not None:
+        return _compressed(*cache_key, encoding)
+    return _compress(payload, encoding)
@@ -1,19 +1,31 @@
 import json
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
-from .vectorstore import init_vectorstore
+from .vectorstore import init_vectorstore, init_retriever
 from .cart import add_to_cart, remove_from_cart, clear_cart
-from .config import OPENAI_API_KEY
+from .config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, LLM_MODEL, LLM_TIMEOUT_S, LLM_ATTEMPT_TIMEOUT_S, LLM_MAX_RETRIES,
+    LLM_HEDGE, LLM_HEDGE_MIN_DELAY_S, LLM_MAX_CONNECTIONS
+)
+from .llm_client import LLMClient
 from .products import find_product_by_name
+from .coalescing import retrieval_flight, llm_flight
+from .profiling import span
 
-llm = ChatOpenAI(
-    model="gpt-3.5-turbo",
+llm = LLMClient(
+    api_key=OPENAI_API_KEY,
+    model=LLM_MODEL,
+    base_url=OPENAI_BASE_URL,
     temperature=0,
-    api_key=OPENAI_API_KEY
+    timeout=LLM_TIMEOUT_S,
+    attempt_timeout=LLM_ATTEMPT_TIMEOUT_S,
+    max_retries=LLM_MAX_RETRIES,
+    hedge=LLM_HEDGE,
+    hedge_min_delay=LLM_HEDGE_MIN_DELAY_S,
+    max_connections=LLM_MAX_CONNECTIONS
 )
 vectorstore = init_vectorstore()
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+retriever = init_retriever(vectorstore, k=3)
 
 prompt = ChatPromptTemplate.from_template(
     """
@@ -21,6 +33,7 @@ You are a witty, persuasive shopping assistant who can also answer general quest
 Always be helpful, concise, and charming; when relevant, nudge toward a purchase with tasteful upsell/cross-sell suggestions.
 
 User query: {query}
+User language (ISO 639-1 code from speech recognition, may be empty): {language}
 Relevant products (may be empty): {context}
 Valid items you are allowed to reference for cart actions: {valid_items}
 Conversation history (last 5 messages):
@@ -37,6 +50,7 @@ Return ONLY valid JSON:
 Rules:
 - If you choose add/remove, the item MUST be exactly one from the Valid items list above. Otherwise set action to 'none'.
 - For general questions or unavailable items, prefer 'none' and provide a helpful reply with suggestions.
+- Write "reply" in the user's language (for 'hi', Hindi or Hinglish matching how the user spoke; otherwise match the query). Keep "action" and "item" exactly as specified above, in English.
 """
 )
 
@@ -52,9 +66,21 @@ def _build_history_block():
         lines.append(f"{role}: {content}")
     return "\n".join(lines)
 
-def process_user_message(message: str):
-   
-    docs = retriever.invoke(message)
+def retrieve_documents(message: str):
+    """Return the products relevant to message (concurrent identical queries share one search)."""
+    with span("retrieve"):
+        return retrieval_flight.do(message, lambda: retriever.invoke(message))
+
+def process_user_message(message: str, docs=None, language: str = None):
+    """
+    Answer a user message and apply any cart action.
+
+    docs may carry products retrieved ahead of time (e.g. by the voice pipeline);
+    otherwise retrieval runs here. language is the transcription language of a
+    voice message, used to reply in kind.
+    """
+    if docs is None:
+        docs = retrieve_documents(message)
     context = "\n".join([getattr(d, "page_content", str(d)) for d in docs])
     candidate_names = []
     for d in docs:
@@ -74,8 +100,10 @@ def process_user_message(message: str):
     valid_items_str = ", ".join(unique_names) if unique_names else ""
 
     history_block = _build_history_block()
-    chain_input = {"query": message, "context": context, "valid_items": valid_items_str, "history": history_block}
-    response = llm.invoke(prompt.format(**chain_input))
+    chain_input = {"query": message, "language": language or "", "context": context, "valid_items": valid_items_str, "history": history_block}
+    prompt_text = prompt.format(**chain_input)
+    with span("llm"):
+        response = llm_flight.do(prompt_text, lambda: llm.invoke(prompt_text))
 
     try:
         data = parser.parse(response.content)
@@ -0,0 +1,97 @@
+import threading
+import logging
+from typing import Any, Callable, Dict, Hashable
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one in-flight upstream request.
+
+    The first caller for a key runs the function; callers arriving with the same
+    key while it is still running wait for it and receive the same result (or
+    exception). Nothing is cached once the call completes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._requests = 0
+        self._executions = 0
+        self._collapsed = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn() for key, or wait for an identical call already in flight.
+
+        Args:
+            key: Hashable identity of the call (e.g. the query or prompt text)
+            fn: Zero-argument callable performing the upstream request
+
+        Returns:
+            The result of fn(), shared between all coalesced callers
+        """
+        with self._lock:
+            self._requests += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            if call.waiters:
+                logger.info(f"[{self.name}] shared one upstream call with {call.waiters} waiter(s)")
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """Return counters describing how many calls were collapsed."""
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "executions": self._executions,
+                "collapsed": self._collapsed,
+                "in_flight": len(self._calls),
+            }
+
+
+retrieval_flight = SingleFlight("retrieval")
+llm_flight = SingleFlight("llm")
+
+
+def get_coalescing_stats() -> dict:
+    """Return coalescing metrics for every upstream we deduplicate."""
+    return {
+        "retrieval": retrieval_flight.stats(),
+        "llm": llm_flight.stats(),
+    }
@@ -3,3 +3,59 @@ from dotenv import load_dotenv
 
 load_dotenv()  
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Whisper: run calibration at startup when no data/whisper_tuning.json exists,
+# and the real-time factor (processing time / audio length) it must meet.
+WHISPER_AUTOTUNE = os.getenv("WHISPER_AUTOTUNE", "0").lower() in ("1", "true", "yes")
+WHISPER_TARGET_RTF = float(os.getenv("WHISPER_TARGET_RTF", "0.5"))
+
+# /voice-chat: transcribe speech chunks one at a time and start retrieval on each while later
+# ones decode. Off by default; measure with `python -m app.voice_pipeline` before enabling.
+VOICE_CHAT_PIPELINED = os.getenv("VOICE_CHAT_PIPELINED", "0").lower() in ("1", "true", "yes")
+
+# Request profiling: requests carrying X-Profile-Token=PROFILE_TOKEN are profiled,
+# as is a random PROFILE_SAMPLE_RATE fraction (0.0-1.0) of all traffic.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# Traffic capture: append anonymized requests to CAPTURE_FILE (JSONL) when set;
+# request bodies such as audio clips are saved to CAPTURE_AUDIO_DIR only if it is set.
+CAPTURE_FILE = os.getenv("CAPTURE_FILE")
+CAPTURE_AUDIO_DIR = os.getenv("CAPTURE_AUDIO_DIR")
+
+# LLM client: OpenAI-compatible endpoint (point at a local stub to test), per-call
+# deadline, per-attempt timeout within it, retry budget and optional hedging
+# (duplicate request after the recent p95 latency; doubles upstream calls for stragglers).
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "20"))
+LLM_ATTEMPT_TIMEOUT_S = float(os.getenv("LLM_ATTEMPT_TIMEOUT_S", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_DELAY_S = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "1.0"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+
+# Transcription language: an ISO code (default "en") or "auto" to detect it on a
+# session's first clip and pin it (if detection probability >= LANGUAGE_PIN_MIN_PROBABILITY)
+# until a clip's mean segment log-probability drops below LANGUAGE_REDETECT_LOGPROB.
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE", "en").strip().lower() or "en"
+LANGUAGE_PIN_MIN_PROBABILITY = float(os.getenv("LANGUAGE_PIN_MIN_PROBABILITY", "0.7"))
+LANGUAGE_REDETECT_LOGPROB = float(os.getenv("LANGUAGE_REDETECT_LOGPROB", "-1.0"))
+LANGUAGE_SESSIONS_MAX = int(os.getenv("LANGUAGE_SESSIONS_MAX", "10000"))
+
+# Admission control: per-client (IP) token bucket and
+# bounded concurrency/queue per expensive resource; full queues answer 503 + Retry-After.
+RATE_LIMIT_PER_MIN = float(os.getenv("RATE_LIMIT_PER_MIN", "60"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+# WHISPER_CONCURRENCY=0 (default) admits one clip per Whisper worker (num_workers).
+WHISPER_CONCURRENCY = int(os.getenv("WHISPER_CONCURRENCY", "0"))
+WHISPER_QUEUE = int(os.getenv("WHISPER_QUEUE", "8"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "16"))
+LLM_QUEUE = int(os.getenv("LLM_QUEUE", "64"))
+
+# Voice input limits: uploads larger than MAX_UPLOAD_MB are rejected with 413, and
+# clips (uploaded or raw PCM) longer than MAX_CLIP_SECONDS with 400.
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "16"))
+MAX_CLIP_SECONDS = float(os.getenv("MAX_CLIP_SECONDS", "60"))
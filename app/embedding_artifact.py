@@ -0,0 +1,231 @@
+"""
+Precomputed product embedding artifact.
+
+Build once (``python -m app.embedding_artifact``) and every worker memory-maps the
+same read-only files at startup, so retrieval is available without touching
+Chroma or the embeddings API for the catalog, and the OS page cache shares one
+copy of the matrix between processes.
+
+Each build writes a new, uniquely named version directory (catalog hash, model
+and build id) into a temporary directory and renames it into place, so files
+that running workers have memory-mapped are never rewritten. Old versions are
+left for those workers; delete them once nothing uses them.
+
+Layout under data/embeddings/:
+    CURRENT                      name of the active version directory
+    <version>/manifest.json      format version, catalog hash, model, shape
+    <version>/embeddings.npy     float32 (count, dim), L2-normalised rows
+    <version>/records.bin        UTF-8 JSON records (text + metadata), back to back
+    <version>/offsets.npy        int64 (count + 1) byte offsets into records.bin
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from langchain_core.documents import Document
+
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+PRODUCTS_FILE = PROJECT_ROOT / "products.json"
+ARTIFACT_DIR = PROJECT_ROOT / "data" / "embeddings"
+FORMAT_VERSION = 1
+EMBED_BATCH_SIZE = 512
+
+
+def catalog_fingerprint() -> str:
+    """Return the sha256 of products.json; an artifact is only valid for this exact catalog."""
+    return hashlib.sha256(PRODUCTS_FILE.read_bytes()).hexdigest()
+
+
+def product_texts():
+    """
+    Build the text and metadata for every catalog product.
+
+    Returns:
+        (texts, metadatas) lists in catalog order
+    """
+    with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
+        products = json.load(f)
+
+    texts, metadatas = [], []
+    for category, items in products.items():
+        for item in items:
+            unit = item.get("unit", "N/A")
+            price = item.get("price", "N/A")
+            text = f"{item['name']} - {unit} - Rs.{price} - Category: {category}"
+            texts.append(text)
+            metadatas.append({"category": category, **item})
+    return texts, metadatas
+
+
+class _IndexRetriever:
+    def __init__(self, index: "ProductEmbeddingIndex", k: int):
+        self.index = index
+        self.k = k
+
+    def invoke(self, query: str) -> List[Document]:
+        return self.index.similarity_search(query, k=self.k)
+
+
+class ProductEmbeddingIndex:
+    """Read-only, memory-mapped product embeddings with a Chroma-like search API."""
+
+    def __init__(self, version_dir: Path, embeddings):
+        self.version_dir = version_dir
+        self.embedding_function = embeddings
+        with open(version_dir / "manifest.json", "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.vectors = np.load(version_dir / "embeddings.npy", mmap_mode="r")
+        self.offsets = np.load(version_dir / "offsets.npy", mmap_mode="r")
+        records = version_dir / "records.bin"
+        # An empty catalog leaves records.bin empty, which cannot be memory-mapped.
+        if records.stat().st_size:
+            self.records = np.memmap(records, dtype=np.uint8, mode="r")
+        else:
+            self.records = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def _document(self, i: int) -> Document:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        record = json.loads(self.records[start:end].tobytes().decode("utf-8"))
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def similarity_search_by_vector(self, embedding, k: int = 4) -> List[Document]:
+        if len(self) == 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = self.vectors @ query
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self._document(int(i)) for i in top]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k=k)
+
+    def as_retriever(self, search_kwargs: Optional[dict] = None) -> _IndexRetriever:
+        return _IndexRetriever(self, (search_kwargs or {}).get("k", 4))
+
+
+def build_artifact(embeddings, artifact_dir: Path = ARTIFACT_DIR) -> Path:
+    """
+    Embed the whole catalog and write a new artifact version, then switch CURRENT to it.
+
+    The version is written to a temporary directory and renamed into place, so an
+    existing version (possibly memory-mapped by running workers) is never modified.
+
+    Args:
+        embeddings: LangChain embeddings object (embed_documents / embed_query)
+        artifact_dir: Root directory holding artifact versions
+
+    Returns:
+        Path of the written version directory
+    """
+    fingerprint = catalog_fingerprint()
+    texts, metadatas = product_texts()
+    model = getattr(embeddings, "model", "")
+
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        vectors.extend(embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+    if texts:
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+    else:
+        # Nothing to embed; keep an empty (0, 0) matrix so the artifact still loads.
+        matrix = np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1.0, norms)
+
+    model_slug = re.sub(r"[^A-Za-z0-9.]+", "-", model).strip("-") or "unknown"
+    build_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    version = f"v{FORMAT_VERSION}-{fingerprint[:12]}-{model_slug}-{build_id}"
+    version_dir = artifact_dir / version
+    tmp_dir = artifact_dir / f".tmp-{version}"
+    tmp_dir.mkdir(parents=True)
+
+    try:
+        offsets = [0]
+        with open(tmp_dir / "records.bin", "wb") as f:
+            for text, metadata in zip(texts, metadatas):
+                blob = json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8")
+                f.write(blob)
+                offsets.append(offsets[-1] + len(blob))
+        np.save(tmp_dir / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+        np.save(tmp_dir / "embeddings.npy", matrix)
+        with open(tmp_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "catalog_sha256": fingerprint,
+                "model": model,
+                "build_id": build_id,
+                "count": int(matrix.shape[0]),
+                "dim": int(matrix.shape[1]) if matrix.size else 0,
+            }, f, indent=2)
+        os.replace(tmp_dir, version_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    current_tmp = artifact_dir / "CURRENT.tmp"
+    current_tmp.write_text(version, encoding="utf-8")
+    os.replace(current_tmp, artifact_dir / "CURRENT")
+    logger.info(f"Wrote embedding artifact {version} ({matrix.shape[0]} products)")
+    return version_dir
+
+
+def load_artifact(embeddings, artifact_dir: Path = ARTIFACT_DIR) -> Optional[ProductEmbeddingIndex]:
+    """
+    Memory-map the current artifact if it exists and matches the catalog.
+
+    Returns:
+        ProductEmbeddingIndex, or None when no usable artifact is present
+    """
+    current = artifact_dir / "CURRENT"
+    if not current.exists():
+        return None
+    version_dir = artifact_dir / current.read_text(encoding="utf-8").strip()
+    try:
+        index = ProductEmbeddingIndex(version_dir, embeddings)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable embedding artifact {version_dir}: {e}")
+        return None
+
+    manifest = index.manifest
+    if manifest.get("format_version") != FORMAT_VERSION:
+        logger.warning(f"Ignoring embedding artifact {version_dir}: unsupported format")
+        return None
+    if manifest.get("catalog_sha256") != catalog_fingerprint():
+        logger.warning(f"Ignoring embedding artifact {version_dir}: built for a different catalog")
+        return None
+    model = getattr(embeddings, "model", "")
+    if manifest.get("model") != model:
+        logger.warning(f"Ignoring embedding artifact {version_dir}: built with model {manifest.get('model')}, not {model}")
+        return None
+    logger.info(f"Using embedding artifact {version_dir.name} ({len(index)} products)")
+    return index
+
+
+if __name__ == "__main__":
+    from langchain_openai import OpenAIEmbeddings
+    from .config import OPENAI_API_KEY
+
+    logging.basicConfig(level=logging.INFO)
+    path = build_artifact(OpenAIEmbeddings(api_key=OPENAI_API_KEY))
+    print(f"Embedding artifact written to {path}")
@@ -0,0 +1,176 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Optional
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class LLMError(Exception):
+    pass
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class LLMClient:
+    """
+    OpenAI-compatible chat completion client with a shared async connection pool.
+
+    Calls run on one background event loop, so every worker thread shares the
+    same keep-alive pool. Each call has an overall deadline and each attempt its
+    own timeout (attempt_timeout, capped by what is left of the deadline), so a
+    timed-out attempt leaves room to retry. Retryable failures (timeouts,
+    connection errors, 429/5xx) are retried with full-jitter backoff, and with
+    hedging enabled a duplicate request is sent once the first has been
+    outstanding longer than the recent p95 latency; the first answer wins.
+
+    Point base_url at a local stub server to test it.
+    """
+
+    def __init__(self, api_key: Optional[str], model: str, base_url: str, temperature: float = 0,
+                 timeout: float = 20.0, attempt_timeout: float = 8.0, max_retries: int = 2,
+                 backoff_base: float = 0.25, backoff_cap: float = 2.0, hedge: bool = False,
+                 hedge_min_delay: float = 1.0,
+                 max_connections: int = 32):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.temperature = temperature
+        self.timeout = timeout
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.max_connections = max_connections
+        self._latencies = deque(maxlen=200)
+        self._counters = {"calls": 0, "upstream_requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+        self._client = None
+        self._loop = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def _http(self) -> httpx.AsyncClient:
+        # Only ever called on the client's event loop.
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before sending a hedged duplicate: recent p95 latency, at least hedge_min_delay."""
+        if not self.hedge or len(self._latencies) < 20:
+            return None
+        ordered = sorted(self._latencies)
+        return max(ordered[int(0.95 * (len(ordered) - 1))], self.hedge_min_delay)
+
+    async def _request(self, prompt: str, timeout: float) -> str:
+        self._counters["upstream_requests"] += 1
+        started = time.perf_counter()
+        response = await self._http().post(
+            "/chat/completions",
+            json={
+                "model": self.model,
+                "temperature": self.temperature,
+                "messages": [{"role": "user", "content": prompt}],
+            },
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        self._latencies.append(time.perf_counter() - started)
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def _hedged(self, prompt: str, deadline: float) -> str:
+        loop = asyncio.get_running_loop()
+        primary = asyncio.ensure_future(self._request(prompt, deadline - loop.time()))
+        backup = None
+        try:
+            delay = self.hedge_delay()
+            if delay is None or delay >= deadline - loop.time():
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            self._counters["hedges"] += 1
+            backup = asyncio.ensure_future(self._request(prompt, deadline - loop.time()))
+            pending = {primary, backup}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def ainvoke(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        self._counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            attempt_deadline = loop.time() + min(self.attempt_timeout, deadline - loop.time())
+            try:
+                return await asyncio.wait_for(self._hedged(prompt, attempt_deadline),
+                                              timeout=attempt_deadline - loop.time())
+            except Exception as e:
+                remaining = deadline - loop.time()
+                if attempt >= self.max_retries or remaining <= 0 or not _retryable(e):
+                    self._counters["failures"] += 1
+                    raise LLMError(f"LLM call failed after {attempt + 1} attempt(s): {e!r}") from e
+                backoff = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                self._counters["retries"] += 1
+                logger.warning(f"LLM call failed ({e!r}); retrying in {backoff:.2f}s")
+                await asyncio.sleep(min(backoff, remaining))
+
+    def invoke(self, prompt: str) -> LLMResponse:
+        """Blocking call for worker threads; the request itself runs on the shared loop."""
+        future = asyncio.run_coroutine_threadsafe(self.ainvoke(prompt), self._ensure_loop())
+        return LLMResponse(future.result())
+
+    def stats(self) -> dict:
+        ordered = sorted(self._latencies)
+        return {
+            **self._counters,
+            "p50_s": ordered[len(ordered) // 2] if ordered else None,
+            "p95_s": ordered[int(0.95 * (len(ordered) - 1))] if ordered else None,
+            "hedge_delay_s": self.hedge_delay(),
+        }
@@ -0,0 +1,183 @@
+"""
+Replay a traffic capture (see app.traffic_capture) against a running server.
+
+    python -m app.loadgen data/capture.jsonl --url http://127.0.0.1:8000 --speedup 4 --concurrency 32
+
+Requests are sent at their captured arrival offsets divided by --speedup, using at
+most --concurrency requests in flight. Reports latency percentiles, error rate and
+throughput overall, per endpoint and per time window.
+
+Latency is measured from each request's scheduled send time, not from when it was
+actually sent, so time spent waiting for a free slot (queueing the server caused by
+being slow) is counted instead of hidden.
+"""
+
+import json
+import math
+import time
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def load_capture(path: Path, audio_dir: Path = None):
+    """Read captured entries, attaching replayable bodies; entries whose body was not saved are skipped."""
+    entries, skipped = [], 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if "json" in entry:
+                entry["data"] = json.dumps(entry["json"]).encode("utf-8")
+            elif entry.get("body_size"):
+                clip = audio_dir / f"{entry.get('body_sha256')}.bin" if audio_dir else None
+                if clip is None or not clip.exists():
+                    skipped += 1
+                    continue
+                entry["data"] = clip.read_bytes()
+            else:
+                entry["data"] = None
+            entries.append(entry)
+    entries.sort(key=lambda e: e["offset_s"])
+    return entries, skipped
+
+
+def replay(entries, base_url: str, speedup: float, concurrency: int, timeout: float):
+    """Send entries on their (scaled) schedule and return one result dict per request."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    slots = threading.Semaphore(concurrency)
+    results, lock = [], threading.Lock()
+    first_offset = entries[0]["offset_s"] if entries else 0.0
+
+    def send(entry, started, scheduled):
+        headers = {"Content-Type": entry["content_type"]} if entry.get("content_type") else {}
+        url = f"{base_url.rstrip('/')}{entry['path']}"
+        if entry.get("query"):
+            url += f"?{entry['query']}"
+        t = time.perf_counter()
+        status, error = None, None
+        try:
+            resp = session.request(entry["method"], url, data=entry["data"], headers=headers, timeout=timeout)
+            status = resp.status_code
+        except requests.RequestException as e:
+            error = type(e).__name__
+        finally:
+            slots.release()
+        with lock:
+            done = time.perf_counter()
+            results.append({
+                "path": entry["path"],
+                "sent_s": scheduled - started,
+                "latency_ms": (done - scheduled) * 1000,
+                "service_ms": (done - t) * 1000,
+                "status": status,
+                "error": error or (f"HTTP {status}" if status and status >= 400 else None),
+            })
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            scheduled = started + (entry["offset_s"] - first_offset) / speedup
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()
+            pool.submit(send, entry, started, scheduled)
+    return results, time.perf_counter() - started
+
+
+def _summary(results, duration):
+    latencies = [r["latency_ms"] for r in results]
+    service = [r["service_ms"] for r in results]
+    errors = sum(1 for r in results if r["error"])
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "throughput_rps": len(results) / duration if duration > 0 else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies, default=0.0),
+        "service_p50_ms": percentile(service, 50),
+        "service_p99_ms": percentile(service, 99),
+    }
+
+
+def report(results, duration, window: float) -> dict:
+    """Aggregate results overall, per endpoint and per send-time window."""
+    by_path = {}
+    for r in results:
+        by_path.setdefault(r["path"], []).append(r)
+    windows = {}
+    for r in results:
+        windows.setdefault(int(r["sent_s"] // window), []).append(r)
+    return {
+        "overall": _summary(results, duration),
+        "endpoints": {path: _summary(rs, duration) for path, rs in sorted(by_path.items())},
+        "windows": [
+            {"start_s": index * window, **_summary(rs, window)}
+            for index, rs in sorted(windows.items())
+        ],
+    }
+
+
+def _print_report(data, skipped):
+    o = data["overall"]
+    print(f"requests={o['requests']} errors={o['errors']} ({o['error_rate']:.1%}) "
+          f"throughput={o['throughput_rps']:.1f} rps skipped(no clip)={skipped}")
+    print(f"latency ms: p50={o['p50_ms']:.1f} p90={o['p90_ms']:.1f} p95={o['p95_ms']:.1f} "
+          f"p99={o['p99_ms']:.1f} max={o['max_ms']:.1f} (from scheduled send)")
+    print(f"service ms (from actual send): p50={o['service_p50_ms']:.1f} p99={o['service_p99_ms']:.1f}")
+    print("\nendpoint                     reqs  err%     p50     p99")
+    for path, s in data["endpoints"].items():
+        print(f"{path:<28} {s['requests']:>5} {s['error_rate']:>5.1%} {s['p50_ms']:>7.1f} {s['p99_ms']:>7.1f}")
+    print("\nwindow(s)   reqs    rps  err%     p50     p99")
+    for w in data["windows"]:
+        print(f"{w['start_s']:>8.0f} {w['requests']:>6} {w['throughput_rps']:>6.1f} {w['error_rate']:>5.1%} "
+              f"{w['p50_ms']:>7.1f} {w['p99_ms']:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a running server.")
+    parser.add_argument("capture", type=Path, help="Capture JSONL written by the traffic capture middleware")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL (default: %(default)s)")
+    parser.add_argument("--speedup", type=float, default=1.0, help="Replay speed multiplier (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max requests in flight (default: %(default)s)")
+    parser.add_argument("--audio-dir", type=Path, default=None, help="Directory of captured request bodies (CAPTURE_AUDIO_DIR)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds (default: %(default)s)")
+    parser.add_argument("--window", type=float, default=10.0, help="Reporting window in seconds (default: %(default)s)")
+    parser.add_argument("--json", type=Path, default=None, help="Also write the full report as JSON to this path")
+    args = parser.parse_args()
+
+    entries, skipped = load_capture(args.capture, args.audio_dir)
+    if not entries:
+        print("Nothing to replay.")
+        return
+    results, duration = replay(entries, args.url, max(args.speedup, 1e-6), max(args.concurrency, 1), args.timeout)
+    data = report(results, duration, args.window)
+    _print_report(data, skipped)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 from fastapi import FastAPI
 from .routes import router
+from .profiling import ProfilingMiddleware, profiling_enabled
+from .traffic_capture import TrafficCaptureMiddleware
+from .config import CAPTURE_FILE, CAPTURE_AUDIO_DIR
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(
@@ -16,6 +19,9 @@ def root():
     return {"message": "Shopping Assistant API is running"}
 
 
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -23,3 +29,6 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+if CAPTURE_FILE:
+    app.add_middleware(TrafficCaptureMiddleware, capture_file=CAPTURE_FILE, audio_dir=CAPTURE_AUDIO_DIR)
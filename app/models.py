@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from .cart import MAX_ITEM_QUANTITY
 
 class ChatRequest(BaseModel):
     message: str
@@ -6,3 +8,10 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     reply: str
 
+class CartOperation(BaseModel):
+    op: Literal["add", "remove", "set"]
+    name: str
+    quantity: Optional[int] = Field(default=None, ge=0, le=MAX_ITEM_QUANTITY)
+
+class CartBatchRequest(BaseModel):
+    operations: List[CartOperation]
@@ -1,11 +1,14 @@
 import json
+import hashlib
 from pathlib import Path
 
 
 PRODUCTS_FILE = Path(__file__).parent.parent / "products.json"
 
-with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
-    PRODUCTS = json.load(f)
+_raw = PRODUCTS_FILE.read_bytes()
+PRODUCTS = json.loads(_raw)
+# Changes whenever products.json changes; keys caches, cursors and ETags.
+CATALOG_VERSION = hashlib.sha256(_raw).hexdigest()[:16]
 
 def get_all_products():
     """
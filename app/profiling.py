@@ -0,0 +1,285 @@
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from .config import PROFILE_TOKEN, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_KEEP
+
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+PROFILE_DIR = PROJECT_ROOT / "data" / "profiles"
+PROFILE_HEADER = "x-profile-token"
+
+_active_profile: contextvars.ContextVar = contextvars.ContextVar("active_profile", default=None)
+
+
+class Profile:
+    """
+    Span timeline plus sampled stacks for one request.
+
+    Only worker threads inside one of the request's open spans are sampled:
+    a pooled thread is watched from span entry to exit, then released for
+    other requests. The event-loop thread is shared by every in-flight request,
+    so it is never sampled; its spans still appear in the timeline.
+    """
+
+    def __init__(self, method: str, path: str, trigger: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.samples = Counter()
+        self._threads = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def watch_current_thread(self):
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def unwatch_current_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def add_span(self, name: str, start: float, end: float):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "start_ms": round(start * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+                "thread": threading.current_thread().name,
+            })
+
+    def _sample_loop(self):
+        interval = PROFILE_INTERVAL_MS / 1000.0
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads)
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = self.elapsed()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "duration_ms": round((self.duration or 0) * 1000, 3),
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+            "samples": dict(self.samples.most_common()),
+        }
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class _Span:
+    __slots__ = ("profile", "name", "start", "watching")
+
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.watching = not _on_event_loop()
+        if self.watching:
+            self.profile.watch_current_thread()
+        self.start = self.profile.elapsed()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.add_span(self.name, self.start, self.profile.elapsed())
+        if self.watching:
+            self.profile.unwatch_current_thread()
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """
+    Time a stage of the current request when it is being profiled.
+
+    Usage: ``with span("llm"): ...``. Outside a profiled request this returns a
+    shared no-op context manager, so instrumentation costs one context lookup.
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        return _NULL_SPAN
+    return _Span(profile, name)
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """True when token matches PROFILE_TOKEN (profiling by header is disabled if it is unset)."""
+    if not PROFILE_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), PROFILE_TOKEN.encode("utf-8"))
+
+
+def profiling_enabled() -> bool:
+    """True when requests can be profiled, i.e. PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set."""
+    return bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def _trigger(token: Optional[str]) -> Optional[str]:
+    if token is not None and is_authorized(token):
+        return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def _save(profile: Profile):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(PROFILE_DIR / f"{profile.id}.json", "w", encoding="utf-8") as f:
+        json.dump(profile.to_dict(), f)
+    stored = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for old in stored[:-PROFILE_KEEP]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+def _store(profile: Profile):
+    profile.finish()
+    try:
+        _save(profile)
+    except OSError as e:
+        logger.error(f"Failed to store profile {profile.id}: {e}")
+
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests that carry a valid X-Profile-Token header or are sampled.
+
+    Pure ASGI rather than BaseHTTPMiddleware, so the app keeps the client's
+    receive channel (disconnects stay visible to queued requests). Stopping the
+    sampler thread and writing the profile happen on a writer thread once the
+    response has been sent; the event loop never blocks on them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/admin/"):
+            await self.app(scope, receive, send)
+            return
+        token = dict(scope.get("headers") or []).get(PROFILE_HEADER.encode("latin-1"))
+        trigger = _trigger(token.decode("latin-1") if token is not None else None)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], trigger)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode("latin-1"))]
+            await send(message)
+
+        context_token = _active_profile.set(profile)
+        profile.start()
+        try:
+            with span("request"):
+                await self.app(scope, receive, send_with_id)
+        finally:
+            _active_profile.reset(context_token)
+            profile.duration = profile.elapsed()
+            _writer.submit(_store, profile)
+
+
+def list_profiles() -> list:
+    """Return summaries of stored profiles, newest first."""
+    if not PROFILE_DIR.exists():
+        return []
+    summaries = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        summaries.append({k: data.get(k) for k in ("id", "method", "path", "trigger", "started_at", "duration_ms")})
+    return summaries
+
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    """Return a stored profile by id, or None."""
+    if not profile_id.isalnum():
+        return None
+    path = PROFILE_DIR / f"{profile_id}.json"
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def collapsed_stacks(profile: dict) -> str:
+    """Render samples in the collapsed-stack format read by flamegraph.pl / speedscope."""
+    return "\n".join(f"{stack} {count}" for stack, count in profile.get("samples", {}).items())
@@ -1,32 +1,77 @@
-from fastapi import APIRouter, Body, UploadFile, File, HTTPException
-from app.products import get_all_products, find_product_by_name
-from app.cart import get_cart
-from app.chatbot import process_user_message
-from app.models import ChatRequest, ChatResponse
-from app.audio_service import get_audio_service
-import tempfile
-import os
+from fastapi import APIRouter, Body, Depends, UploadFile, File, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from app.products import find_product_by_name
+from app.catalog import catalog_body, negotiate_encoding, encode_body, InvalidCursor, MAX_PAGE_SIZE
+from app.cart import get_cart, apply_cart_operations
+from app.chatbot import process_user_message, retriever, llm
+from app.models import ChatRequest, ChatResponse, CartBatchRequest
+from app.audio_service import get_audio_service, decode_audio
+from app.audio_dsp import SAMPLE_FORMATS, SUPPORTED_SAMPLE_RATES, to_whisper_input
+from app.coalescing import get_coalescing_stats
+from app.voice_pipeline import transcribe_speculatively, respond
+from app.config import VOICE_CHAT_PIPELINED, MAX_UPLOAD_MB, MAX_CLIP_SECONDS, WHISPER_CONCURRENCY
+from app.profiling import span, is_authorized, list_profiles, load_profile, collapsed_stacks
+from app.admission import rate_limit, whisper_gate, llm_gate, get_admission_stats
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# More Whisper slots than model workers would only queue clips inside the model.
+if not WHISPER_CONCURRENCY:
+    whisper_gate.resize(get_audio_service().num_workers)
+
+def _catalog_response(request: Request, view: str, category, min_price, max_price, cursor, limit):
+    try:
+        payload, etag, cache_key = catalog_body(view, category, min_price, max_price, cursor, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    body = encode_body(payload, encoding, cache_key)
+    if body is not payload:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/items")
-def items():
-    """Return all available products grouped by category."""
-    return get_all_products()
+def items(
+    request: Request,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Return available products grouped by category.
+
+    Without limit/cursor the whole (filtered) catalog is returned as {category: [items]}.
+    With limit, returns {"categories": {...}, "next_cursor": str | null}.
+    """
+    return _catalog_response(request, "items", category, min_price, max_price, cursor, limit)
 
 @router.get("/items_dropdown")
-def items_dropdown():
+def items_dropdown(
+    request: Request,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
     """Return items in dropdown-friendly grouping.
     {"categories": [{"category": str, "items": [{name, price, unit}]}]}
+    With limit, also includes "next_cursor" (null on the last page).
     """
-    data = get_all_products()
-    categories = []
-    for category, items in data.items():
-        categories.append({
-            "category": category,
-            "items": [{"name": i.get("name"), "price": i.get("price"), "unit": i.get("unit")} for i in items]
-        })
-    return {"categories": categories}
+    return _catalog_response(request, "dropdown", category, min_price, max_price, cursor, limit)
 
 def _cart_summary():
     items = get_cart()  
@@ -60,71 +105,196 @@ def cart():
     """Return current cart contents with quantities, price and totals."""
     return _cart_summary()
 
-@router.post("/chat")
-def chat(body: dict = Body(...)):
+@router.post("/cart/batch")
+def cart_batch(body: CartBatchRequest):
+    """
+    Apply many add/remove/set operations to the cart in one atomic write.
+    Accepts {"operations": [{"op": "add"|"remove"|"set", "name": str, "quantity": int}]}
+    and returns the updated cart summary.
+    """
+    try:
+        apply_cart_operations([operation.model_dump() for operation in body.operations])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _cart_summary()
+
+@router.get("/metrics/coalescing")
+def coalescing_metrics():
+    """Return how many concurrent retrieval/LLM calls were collapsed into one upstream request."""
+    return get_coalescing_stats()
+
+@router.get("/metrics/retrieval")
+def retrieval_metrics():
+    """Return how many retrievals were answered by an exact product-name hit vs. hybrid search."""
+    return retriever.stats()
+
+@router.get("/metrics/llm")
+def llm_metrics():
+    """Return LLM client counters (retries, hedges) and recent upstream latency."""
+    return llm.stats()
+
+@router.get("/metrics/admission")
+def admission_metrics():
+    """Return rate-limit rejections and per-resource queue state."""
+    return get_admission_stats()
+
+@router.post("/chat", dependencies=[Depends(rate_limit)])
+async def chat(request: Request, body: dict = Body(...)):
     """
     Process a user message via LangChain + Chroma pipeline.
     Accepts either {"message": str} or {"text": str}
     """
     message = body.get("message") or body.get("text") or ""
-    result = process_user_message(message)
+    async with llm_gate.admit(request):
+        result = await run_in_threadpool(process_user_message, message)
   
     result["cart"] = _cart_summary()
     return result
 
-@router.post("/transcribe")
-async def transcribe_audio(audio_file: UploadFile = File(...)):
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+
+async def _read_upload(audio_file: UploadFile) -> bytes:
+    """Validate an uploaded audio file's type and size and return its bytes."""
+    if not audio_file.content_type or not audio_file.content_type.startswith('audio/'):
+        raise HTTPException(status_code=400, detail="File must be an audio file")
+    content = await audio_file.read(MAX_UPLOAD_BYTES + 1)
+    if len(content) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Audio file larger than {MAX_UPLOAD_MB:g} MB")
+    return content
+
+async def _decode_upload(content: bytes):
+    """Decode an upload to 16 kHz mono samples; call only after whisper_gate has admitted the request."""
+    try:
+        return await run_in_threadpool(decode_audio, content)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _transcribe(audio, session_id: Optional[str]):
+    """Run a full transcription; returns (text or None, language)."""
+    transcription = get_audio_service().start_transcription(audio, session_id)
+    transcribed_text = transcription.text()
+    if transcribed_text:
+        logger.info(f"Transcription successful ({transcription.language}): {transcribed_text}")
+    return transcribed_text or None, transcription.language
+
+@router.post("/transcribe", dependencies=[Depends(rate_limit)])
+async def transcribe_audio(request: Request, audio_file: UploadFile = File(...), x_session_id: Optional[str] = Header(None)):
     """
     Transcribe audio file to text using Faster-Whisper.
-    Accepts audio files in common formats (wav, mp3, m4a, etc.)
+    Accepts audio files in common formats (wav, flac, ogg/opus, mp3, m4a, etc.);
+    wav/flac/ogg are decoded in memory.
+    Send X-Session-Id so the detected language is pinned for later clips (WHISPER_LANGUAGE=auto).
     """
     try:
-       
-        if not audio_file.content_type or not audio_file.content_type.startswith('audio/'):
-            raise HTTPException(status_code=400, detail="File must be an audio file")
-        
-    
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{audio_file.filename.split('.')[-1]}") as temp_file:
-            content = await audio_file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        try:
-           
-            audio_service = get_audio_service()
-            transcribed_text = audio_service.transcribe_audio_file(temp_file_path)
-            
-            if transcribed_text is None:
-                raise HTTPException(status_code=400, detail="Could not transcribe audio. Please ensure the audio contains clear speech.")
-            
-            return {
-                "transcribed_text": transcribed_text,
-                "success": True
-            }
-            
-        finally:
-            
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                
+        content = await _read_upload(audio_file)
+
+        async with whisper_gate.admit(request):
+            audio = await _decode_upload(content)
+            transcribed_text, language = await run_in_threadpool(_transcribe, audio, x_session_id)
+
+        if transcribed_text is None:
+            raise HTTPException(status_code=400, detail="Could not transcribe audio. Please ensure the audio contains clear speech.")
+
+        return {
+            "transcribed_text": transcribed_text,
+            "language": language,
+            "success": True
+        }
+
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
-@router.post("/voice-chat")
-async def voice_chat(audio_file: UploadFile = File(...)):
+@router.post("/transcribe/raw", dependencies=[Depends(rate_limit)])
+async def transcribe_raw(
+    request: Request,
+    sample_rate: int = Query(16000),
+    channels: int = Query(1, ge=1, le=8),
+    sample_format: str = Query("s16le"),
+    x_session_id: Optional[str] = Header(None),
+):
+    """
+    Transcribe raw interleaved PCM sent as the request body (application/octet-stream).
+    Query parameters describe the samples; audio is downmixed and resampled to 16 kHz.
+    """
+    if sample_format not in SAMPLE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"sample_format must be one of: {', '.join(SAMPLE_FORMATS)}")
+    if sample_rate not in SUPPORTED_SAMPLE_RATES:
+        raise HTTPException(status_code=400, detail=f"sample_rate must be one of: {', '.join(map(str, SUPPORTED_SAMPLE_RATES))}")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Request body larger than {MAX_UPLOAD_MB:g} MB")
+    audio_data = bytes(body)
+    if not audio_data:
+        raise HTTPException(status_code=400, detail="Request body must contain PCM samples")
+    seconds = len(audio_data) / (np.dtype(SAMPLE_FORMATS[sample_format][0]).itemsize * channels * sample_rate)
+    if seconds > MAX_CLIP_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Clip is {seconds:.0f} s long; at most {MAX_CLIP_SECONDS:.0f} s is accepted")
+
+    try:
+        async with whisper_gate.admit(request):
+            try:
+                audio = await run_in_threadpool(to_whisper_input, audio_data, sample_rate, channels, sample_format)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid PCM audio: {e}")
+            transcribed_text, language = await run_in_threadpool(_transcribe, audio, x_session_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    if transcribed_text is None:
+        raise HTTPException(status_code=400, detail="Could not transcribe audio. Please ensure the audio contains clear speech.")
+    return {
+        "transcribed_text": transcribed_text,
+        "language": language,
+        "success": True
+    }
+
+def _pipelined_transcribe(audio, session_id: Optional[str]):
+    transcription = get_audio_service().start_chunked_transcription(audio, session_id)
+    with span("voice.pipeline"):
+        return transcribe_speculatively(transcription), transcription.language
+
+@router.post("/voice-chat", dependencies=[Depends(rate_limit)])
+async def voice_chat(request: Request, audio_file: UploadFile = File(...), pipelined: Optional[bool] = None,
+                     x_session_id: Optional[str] = Header(None)):
     """
     Complete voice-to-chat pipeline: transcribe audio and process as chat message.
     Returns both transcription and chatbot response.
+    With pipelined=true (default: VOICE_CHAT_PIPELINED), the clip is transcribed one
+    speech chunk at a time and retrieval starts on each chunk while later ones decode.
+    The detected language is passed to the assistant, which replies in it.
     """
     try:
-       
-        transcription_result = await transcribe_audio(audio_file)
-        transcribed_text = transcription_result["transcribed_text"]
-        
-       
-        chat_result = process_user_message(transcribed_text)
+        if pipelined is None:
+            pipelined = VOICE_CHAT_PIPELINED
+
+        if pipelined:
+            content = await _read_upload(audio_file)
+            # Retrieval overlaps decoding; the Whisper slot is released once the transcript is final.
+            async with whisper_gate.admit(request):
+                audio = await _decode_upload(content)
+                speculative, language = await run_in_threadpool(_pipelined_transcribe, audio, x_session_id)
+            transcribed_text = speculative.transcript
+            if not transcribed_text:
+                raise HTTPException(status_code=400, detail="Could not transcribe audio. Please ensure the audio contains clear speech.")
+            try:
+                async with llm_gate.admit(request):
+                    chat_result = await run_in_threadpool(respond, speculative, language)
+            finally:
+                speculative.cancel()
+        else:
+            transcription_result = await transcribe_audio(request, audio_file, x_session_id)
+            transcribed_text = transcription_result["transcribed_text"]
+            
+           
+            async with llm_gate.admit(request):
+                chat_result = await run_in_threadpool(
+                    process_user_message, transcribed_text, language=transcription_result["language"]
+                )
         chat_result["cart"] = _cart_summary()
         
       
@@ -138,3 +308,34 @@ async def voice_chat(audio_file: UploadFile = File(...)):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Voice chat processing failed: {str(e)}")
+
+def _require_profile_token(token: Optional[str]):
+    if not is_authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Profile-Token")
+
+@router.get("/admin/profiles")
+def admin_profiles(x_profile_token: Optional[str] = Header(None)):
+    """List stored request profiles, newest first."""
+    _require_profile_token(x_profile_token)
+    return {"profiles": list_profiles()}
+
+@router.get("/admin/profiles/{profile_id}")
+def admin_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """Return one profile: span timeline plus sampled stacks."""
+    _require_profile_token(x_profile_token)
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@router.get("/admin/profiles/{profile_id}/collapsed")
+def admin_profile_collapsed(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """Download a profile's samples as collapsed stacks (flamegraph.pl / speedscope input)."""
+    _require_profile_token(x_profile_token)
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        collapsed_stacks(profile),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed.txt"'}
+    )
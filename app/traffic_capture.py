@@ -0,0 +1,150 @@
+import re
+import json
+import time
+import queue
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+MAX_CAPTURED_BODY = 25 * 1024 * 1024
+MAX_PENDING_BYTES = 64 * 1024 * 1024
+RECORD_OVERHEAD_BYTES = 512
+SKIPPED_PREFIXES = ("/admin/", "/metrics/")
+TEXT_FIELDS = ("message", "text")
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_LONG_NUMBER = re.compile(r"\+?\d[\d\s-]{6,}\d")
+
+
+def anonymize_text(text: str) -> str:
+    """Mask e-mail addresses and phone/card-like digit runs in user text."""
+    text = _EMAIL.sub("<email>", text)
+    return _LONG_NUMBER.sub("<number>", text)
+
+
+class TrafficCaptureMiddleware:
+    """
+    ASGI middleware appending one anonymized JSON line per request to capture_file.
+
+    Records method, path, query, arrival offset, status and duration. JSON chat
+    text is kept with e-mails and long numbers masked; other bodies (audio
+    uploads) are hashed as they stream in and recorded by sha256 and size; their
+    bytes are only held, and saved under audio_dir, when it is set so they can
+    be replayed. Client addresses and headers other than Content-Type are never
+    recorded.
+
+    Serialization and file writes happen on a background writer thread; the
+    request path only enqueues. Once MAX_PENDING_BYTES of records are waiting
+    for the writer, further records are dropped (and counted) rather than
+    blocking requests or growing memory.
+    """
+
+    def __init__(self, app, capture_file: str, audio_dir: Optional[str] = None):
+        self.app = app
+        self.capture_file = Path(capture_file)
+        self.capture_file.parent.mkdir(parents=True, exist_ok=True)
+        self.audio_dir = Path(audio_dir) if audio_dir else None
+        if self.audio_dir:
+            self.audio_dir.mkdir(parents=True, exist_ok=True)
+        self._t0 = time.time()
+        self._pending = queue.Queue()
+        self._pending_bytes = 0
+        self._pending_lock = threading.Lock()
+        self.dropped = 0
+        self._writer = threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True)
+        self._writer.start()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(SKIPPED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        headers = dict(scope.get("headers") or [])
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        keep_body = content_type.startswith("application/json") or self.audio_dir is not None
+        digest = hashlib.sha256()
+        chunks, size = [], 0
+        status = {"code": None}
+
+        async def capturing_receive():
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                digest.update(body)
+                if keep_body and size + len(body) <= MAX_CAPTURED_BODY:
+                    chunks.append(body)
+                size += len(body)
+            return message
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capturing_receive, capturing_send)
+        finally:
+            entry = {
+                "offset_s": round(arrived - self._t0, 4),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "content_type": content_type,
+                "status": status["code"],
+                "duration_ms": round((time.time() - arrived) * 1000, 3),
+            }
+            cost = RECORD_OVERHEAD_BYTES + sum(len(chunk) for chunk in chunks)
+            with self._pending_lock:
+                accepted = self._pending_bytes + cost <= MAX_PENDING_BYTES
+                if accepted:
+                    self._pending_bytes += cost
+                else:
+                    self.dropped += 1
+                    dropped = self.dropped
+            if accepted:
+                self._pending.put_nowait((entry, chunks, size, digest.hexdigest(), cost))
+            elif dropped % 100 == 1:
+                logger.warning(f"Traffic capture writer is behind; {dropped} record(s) dropped")
+
+    def _write_loop(self):
+        with open(self.capture_file, "a", encoding="utf-8") as f:
+            while True:
+                entry, chunks, size, digest, cost = self._pending.get()
+                try:
+                    f.write(self._record(entry, b"".join(chunks), size, digest) + "\n")
+                    f.flush()
+                except Exception as e:
+                    logger.error(f"Traffic capture failed: {e}")
+                finally:
+                    with self._pending_lock:
+                        self._pending_bytes -= cost
+
+    def _record(self, entry: dict, body: bytes, size: int, digest: str) -> str:
+        content_type = entry["content_type"]
+
+        if body and content_type.startswith("application/json"):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = None
+            if isinstance(payload, dict):
+                for field in TEXT_FIELDS:
+                    if isinstance(payload.get(field), str):
+                        payload[field] = anonymize_text(payload[field])
+                entry["json"] = payload
+        elif size:
+            entry["body_size"] = size
+            entry["body_sha256"] = digest
+            if self.audio_dir and len(body) == size:
+                clip_path = self.audio_dir / f"{digest}.bin"
+                if not clip_path.exists():
+                    clip_path.write_bytes(body)
+
+        return json.dumps(entry, ensure_ascii=False)
@@ -1,8 +1,11 @@
+import re
+import math
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
-import json
+from langchain_core.documents import Document
 from pathlib import Path
 from .config import OPENAI_API_KEY
+from .embedding_artifact import load_artifact, product_texts
 
 PROJECT_ROOT = Path(__file__).parent.parent
 PRODUCTS_FILE = PROJECT_ROOT / "products.json"
@@ -10,32 +13,137 @@ CHROMA_DIR = PROJECT_ROOT / "data" / "chroma"
 
 def init_vectorstore():
     embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+
+    artifact = load_artifact(embeddings)
+    if artifact is not None:
+        return artifact
+
     vectorstore = Chroma(
         collection_name="products",
         embedding_function=embeddings,
         persist_directory=str(CHROMA_DIR)
     )
 
-    
+
     try:
-        count = vectorstore._collection.count() 
+        count = vectorstore._collection.count()
     except Exception:
         count = 0
 
     if count == 0:
-        with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
-            products = json.load(f)
-
-        texts, metadatas = [], []
-        for category, items in products.items():
-            for item in items:
-                unit = item.get("unit", "N/A")
-                price = item.get("price", "N/A")
-                text = f"{item['name']} - {unit} - Rs.{price} - Category: {category}"
-                texts.append(text)
-                metadatas.append({"category": category, **item})
-
+        texts, metadatas = product_texts()
         if texts:
             vectorstore.add_texts(texts=texts, metadatas=metadatas)
 
     return vectorstore
+
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def _tokenize(text: str):
+    return _TOKEN.findall((text or "").lower())
+
+
+class LexicalIndex:
+    """In-memory BM25 index over product names and categories, with exact name matching."""
+
+    def __init__(self, texts, metadatas, k1: float = 1.2, b: float = 0.75):
+        self.docs = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        self.k1 = k1
+        self.b = b
+        self.doc_tokens = []
+        self.postings = {}
+        self.names = {}
+        for i, metadata in enumerate(metadatas):
+            name_tokens = tuple(_tokenize(metadata.get("name", "")))
+            tokens = list(name_tokens) + _tokenize(metadata.get("category", ""))
+            self.doc_tokens.append(len(tokens))
+            for token in set(tokens):
+                self.postings.setdefault(token, []).append((i, tokens.count(token)))
+            if name_tokens:
+                self.names.setdefault(name_tokens, []).append(i)
+        self.avgdl = (sum(self.doc_tokens) / len(self.doc_tokens)) if self.doc_tokens else 0.0
+        self.max_name_len = max((len(n) for n in self.names), default=0)
+
+    def exact_matches(self, query: str):
+        """
+        Return indices of products whose full name appears in the query, or [] if
+        none do or the match is ambiguous (one name shared by several products).
+        Names contained in a longer matched name ("water" in "mineral water") are dropped.
+        """
+        tokens = _tokenize(query)
+        spans = []
+        for start in range(len(tokens)):
+            for length in range(min(self.max_name_len, len(tokens) - start), 0, -1):
+                phrase = tuple(tokens[start:start + length])
+                if phrase in self.names:
+                    spans.append((start, start + length, phrase))
+        spans = [s for s in spans if not any(o is not s and o[0] <= s[0] and s[1] <= o[1] for o in spans)]
+
+        matches = []
+        for _, _, phrase in spans:
+            indices = self.names[phrase]
+            if len(indices) > 1:
+                return []
+            if indices[0] not in matches:
+                matches.append(indices[0])
+        return matches
+
+    def search(self, query: str, k: int):
+        """Return up to k (index, bm25 score) pairs, best first."""
+        n = len(self.docs)
+        scores = {}
+        for token in set(_tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_tokens[i] / self.avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class HybridRetriever:
+    """
+    Lexical-first product retriever.
+
+    An unambiguous exact product-name hit is returned straight from the lexical
+    index without calling the embeddings API; otherwise BM25 and vector results
+    are fused with reciprocal rank fusion.
+    """
+
+    RRF_K = 60
+
+    def __init__(self, lexical: LexicalIndex, vector_retriever, k: int = 3):
+        self.lexical = lexical
+        self.vector_retriever = vector_retriever
+        self.k = k
+        self.exact_hits = 0
+        self.fused = 0
+
+    def invoke(self, query: str):
+        exact = self.lexical.exact_matches(query)
+        if exact:
+            self.exact_hits += 1
+            return [self.lexical.docs[i] for i in exact]
+
+        self.fused += 1
+        scores, docs = {}, {}
+        lexical_docs = [self.lexical.docs[i] for i, _ in self.lexical.search(query, self.k * 2)]
+        for ranked in (lexical_docs, self.vector_retriever.invoke(query)):
+            for rank, doc in enumerate(ranked):
+                key = (doc.metadata.get("name") or doc.page_content).lower()
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.RRF_K + rank + 1)
+                docs.setdefault(key, doc)
+        best = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [docs[key] for key in best]
+
+    def stats(self) -> dict:
+        return {"exact_hits": self.exact_hits, "fused": self.fused}
+
+
+def init_retriever(vectorstore, k: int = 3) -> HybridRetriever:
+    """Build the hybrid lexical + vector retriever over the product catalog."""
+    texts, metadatas = product_texts()
+    return HybridRetriever(LexicalIndex(texts, metadatas), vectorstore.as_retriever(search_kwargs={"k": k}), k=k)
@@ -0,0 +1,162 @@
+"""
+Pipelined voice chat: speculative product retrieval while later speech chunks decode.
+
+Whether this beats the sequential path depends on the clips and the machine
+(extra encoder passes per chunk vs. retrieval hidden behind decoding). Measure
+before enabling VOICE_CHAT_PIPELINED:
+
+    python -m app.voice_pipeline clip1.wav clip2.flac --repeats 5
+"""
+
+import time
+import argparse
+import logging
+import statistics
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+from .chatbot import retrieve_documents, process_user_message
+from .profiling import span
+
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_K = 3
+
+_speculation_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="voice-speculation")
+
+
+def _fuse_documents(doc_lists: List[list], limit: int) -> list:
+    """Interleave per-segment results (best of each segment first), dropping duplicates."""
+    fused, seen = [], set()
+    depth = max((len(docs) for docs in doc_lists), default=0)
+    for rank in range(depth):
+        for docs in doc_lists:
+            if rank >= len(docs):
+                continue
+            key = getattr(docs[rank], "page_content", str(docs[rank]))
+            if key in seen:
+                continue
+            seen.add(key)
+            fused.append(docs[rank])
+            if len(fused) >= limit:
+                return fused
+    return fused
+
+
+class SpeculativeTranscript:
+    """A final transcript plus the retrievals started on its chunks while it was decoding."""
+
+    def __init__(self, transcript: str, futures: list, chunks: int):
+        self.transcript = transcript
+        self.futures = futures
+        self.chunks = chunks
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+
+
+def transcribe_speculatively(segments: Iterable[str]) -> SpeculativeTranscript:
+    """
+    Consume a transcription, sending each speech chunk to retrieval as soon as it
+    is transcribed, while later chunks are still decoding.
+
+    Returns once the transcript is final; only this part needs the Whisper slot.
+
+    Args:
+        segments: Iterator of chunk texts, e.g. AudioService.start_chunked_transcription()
+    """
+    parts, futures = [], []
+    try:
+        for text in segments:
+            parts.append(text)
+            # Run in a copy of this context so profiling spans follow the work.
+            futures.append(_speculation_pool.submit(contextvars.copy_context().run, retrieve_documents, text))
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+    transcript = " ".join(parts).strip()
+    logger.info(f"Pipelined transcription ({len(parts)} chunk(s)): {transcript}")
+    return SpeculativeTranscript(transcript, futures, len(parts))
+
+
+def respond(speculative: SpeculativeTranscript, language: Optional[str] = None) -> dict:
+    """
+    Answer a speculatively transcribed message.
+
+    The speculative results are reconciled: a single chunk's results are used
+    as-is, several chunks' results are fused down to RETRIEVAL_K documents (the
+    same context size as the sequential path), and if any speculative search
+    failed they are discarded (falling back to one search on the full transcript).
+
+    Args:
+        speculative: Result of transcribe_speculatively() with a non-empty transcript
+        language: Language of the utterance, passed on to the assistant
+    """
+    docs = None
+    try:
+        with span("speculation.wait"):
+            doc_lists = [future.result() for future in speculative.futures]
+        if len(doc_lists) == 1:
+            docs = doc_lists[0]
+        else:
+            docs = _fuse_documents(doc_lists, RETRIEVAL_K)
+    except Exception as e:
+        logger.warning(f"Speculative retrieval failed, retrying on full transcript: {e}")
+    return process_user_message(speculative.transcript, docs=docs, language=language)
+
+
+def run_pipelined(segments: Iterable[str], language: Optional[str] = None) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    Overlap transcription with retrieval for a voice message: transcribe_speculatively()
+    followed by respond().
+
+    Returns:
+        (transcript, chat result), or (None, None) when no speech was detected
+    """
+    speculative = transcribe_speculatively(segments)
+    if not speculative.transcript:
+        return None, None
+    return speculative.transcript, respond(speculative, language)
+
+
+def _benchmark(paths, repeats: int):
+    from .audio_service import get_audio_service, decode_audio_file
+    from .audio_dsp import WHISPER_SAMPLE_RATE
+
+    service = get_audio_service()
+    timings = {"sequential": [], "pipelined": []}
+    for path in paths:
+        audio = decode_audio_file(str(path), sampling_rate=WHISPER_SAMPLE_RATE)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            transcription = service.start_transcription(audio)
+            transcript = transcription.text()
+            if transcript:
+                process_user_message(transcript, language=transcription.language)
+            timings["sequential"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            transcription = service.start_chunked_transcription(audio)
+            run_pipelined(transcription, language=transcription.language)
+            timings["pipelined"].append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sequential and pipelined voice chat end to end.")
+    parser.add_argument("clips", nargs="+", help="Representative voice clips")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per clip and mode (default: %(default)s)")
+    args = parser.parse_args()
+
+    timings = _benchmark(args.clips, max(args.repeats, 1))
+    for mode, values in timings.items():
+        print(f"{mode:<11} median={statistics.median(values) * 1000:.0f} ms  max={max(values) * 1000:.0f} ms")
+    speedup = statistics.median(timings["sequential"]) / statistics.median(timings["pipelined"])
+    print(f"pipelined speedup: {speedup:.2f}x (enable VOICE_CHAT_PIPELINED only if this is clearly above 1)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
+import io
+import os
+import uuid
 import gradio as gr
 import requests
-import tempfile
-import os
+import numpy as np
 import soundfile as sf
+from app.audio_dsp import resample, WHISPER_SAMPLE_RATE
 
 BACKEND_URL = "http://127.0.0.1:8000"
+# "flac" (lossless) or "opus" (Ogg/Opus at speech bitrates; falls back to FLAC if unsupported).
+VOICE_UPLOAD_CODEC = os.getenv("VOICE_UPLOAD_CODEC", "flac").lower()
 
 
 def fetch_items():
@@ -81,27 +86,44 @@ def send_text_chat(history, user_text):
     return history, cart_md
 
 
-def send_voice_chat(history, audio):
+def encode_voice_clip(sample_rate, data):
+    """
+    Downmix the microphone capture to 16 kHz mono and encode it in memory.
+    Returns (filename, bytes, content type).
+    """
+    samples = np.asarray(data)
+    if np.issubdtype(samples.dtype, np.integer):
+        samples = samples.astype(np.float32) / float(np.iinfo(samples.dtype).max + 1)
+    else:
+        samples = samples.astype(np.float32)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1, dtype=np.float32)
+    samples = resample(samples, int(sample_rate), WHISPER_SAMPLE_RATE)
+
+    buffer = io.BytesIO()
+    if VOICE_UPLOAD_CODEC == "opus" and "OPUS" in sf.available_subtypes("OGG"):
+        sf.write(buffer, samples, WHISPER_SAMPLE_RATE, format="OGG", subtype="OPUS")
+        return "audio.ogg", buffer.getvalue(), "audio/ogg"
+    sf.write(buffer, samples, WHISPER_SAMPLE_RATE, format="FLAC", subtype="PCM_16")
+    return "audio.flac", buffer.getvalue(), "audio/flac"
+
+
+def send_voice_chat(history, audio, session_id=None):
     history = history or []
     if audio is None:
         return history, gr.update()
     sample_rate, data = audio
 
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
-            sf.write(f.name, data, sample_rate)
-            tmp_path = f.name
-        with open(tmp_path, "rb") as af:
-            files = {"audio_file": ("audio.wav", af, "audio/wav")}
-            r = requests.post(f"{BACKEND_URL}/voice-chat", files=files, timeout=60)
-            r.raise_for_status()
-            data = r.json()
-    finally:
-        try:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-        except Exception:
-            pass
+        filename, payload, content_type = encode_voice_clip(sample_rate, data)
+        files = {"audio_file": (filename, payload, content_type)}
+        headers = {"X-Session-Id": session_id} if session_id else {}
+        r = requests.post(f"{BACKEND_URL}/voice-chat", files=files, headers=headers, timeout=60)
+        r.raise_for_status()
+        data = r.json()
+    except Exception:
+        history = history + [("(voice)", "Error: Could not reach backend.")]
+        return history, gr.update()
 
     if data.get("success"):
         transcribed_text = data.get("transcribed_text", "")
@@ -280,11 +302,14 @@ with gr.Blocks(title="Shopping Assistant", css=CUSTOM_CSS, theme=gr.themes.Soft(
                 with gr.TabItem("🎙️ Voice"):
                     mic = gr.Audio(sources=["microphone"], type="numpy", label="Press to speak, release to send")
 
+    # One id per browser session so the backend can pin the detected speech language.
+    session_id = gr.State(lambda: uuid.uuid4().hex)
+
     demo.load(fn=refresh_sidebar, inputs=None, outputs=[sidebar_items, sidebar_cart])
 
     refresh_btn.click(fn=refresh_sidebar, inputs=None, outputs=[sidebar_items, sidebar_cart])
     txt.submit(fn=send_text_chat, inputs=[chat, txt], outputs=[chat, sidebar_cart]).then(lambda: "", None, txt)
-    mic.change(fn=send_voice_chat, inputs=[chat, mic], outputs=[chat, sidebar_cart])
+    mic.change(fn=send_voice_chat, inputs=[chat, mic, session_id], outputs=[chat, sidebar_cart])
 
 
 if __name__ == "__main__":
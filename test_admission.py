@@ -0,0 +1,105 @@
+"""
+Tests for the per-resource admission gate.
+Run with: python -m pytest test_admission.py
+"""
+
+import asyncio
+
+from fastapi import FastAPI, HTTPException, Request
+
+from app import profiling
+from app.admission import ResourceGate
+from app.profiling import ProfilingMiddleware
+
+
+class _Client:
+    """Request stand-in for driving a gate directly; never disconnects."""
+
+    async def is_disconnected(self):
+        return False
+
+
+async def _wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_burst_in_one_tick_respects_queue_limit():
+    gate = ResourceGate("test", concurrency=1, max_queue=1)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with gate.admit(_Client()):
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold()) for _ in range(4)]
+        await _wait_for(lambda: gate.rejected == 2)
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(main())
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert [r.status_code for r in rejected] == [503, 503]
+    assert gate.active == 0 and gate.waiting == 0
+
+
+def test_client_disconnect_while_queued_leaves_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    gate = ResourceGate("test", concurrency=1, max_queue=4)
+    api = FastAPI()
+    release = None
+
+    @api.post("/work")
+    async def work(request: Request):
+        async with gate.admit(request):
+            await release.wait()
+        return {"ok": True}
+
+    # Mounted the way main.py mounts it, so the gate sees the client through the middleware.
+    app = ProfilingMiddleware(api)
+
+    async def call(disconnect):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/work", "raw_path": b"/work", "root_path": "", "query_string": b"",
+            "headers": [(b"x-profile-token", b"secret")], "client": ("127.0.0.1", 1), "server": ("test", 80),
+        }
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        await app(scope, receive, send)
+        return sent[0]["status"]
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        first_gone, second_gone = asyncio.Event(), asyncio.Event()
+        first = asyncio.create_task(call(first_gone))
+        await _wait_for(lambda: gate.active == 1)
+        second = asyncio.create_task(call(second_gone))
+        await _wait_for(lambda: gate.waiting == 1)
+
+        second_gone.set()
+        second_status = await asyncio.wait_for(second, timeout=2)
+        assert gate.waiting == 0 and gate.active == 1
+
+        release.set()
+        return await first, second_status
+
+    assert asyncio.run(main()) == (200, 499)
+    assert gate.abandoned == 1
@@ -0,0 +1,90 @@
+"""
+Tests for PCM decoding and the polyphase resampler.
+Run with: python -m pytest test_audio_dsp.py
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.audio_dsp import (
+    SUPPORTED_SAMPLE_RATES,
+    WHISPER_SAMPLE_RATE,
+    _MAX_RATIO_TERM,
+    _ratio,
+    pcm_to_mono_float,
+    resample,
+)
+
+
+def _tone(freq, sample_rate, seconds=0.5, amplitude=0.5):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def _interior(x, edge=200):
+    # The filter ramps in and out over its length at both ends.
+    return x[edge:-edge]
+
+
+@pytest.mark.parametrize("orig_sr", SUPPORTED_SAMPLE_RATES)
+def test_resampled_tone_matches_reference(orig_sr):
+    seconds = 0.5
+    out = resample(_tone(440, orig_sr, seconds), orig_sr)
+
+    assert out.dtype == np.float32
+    assert out.size == math.ceil(int(orig_sr * seconds) * WHISPER_SAMPLE_RATE / orig_sr)
+    expected = _tone(440, WHISPER_SAMPLE_RATE, out.size / WHISPER_SAMPLE_RATE)
+    assert np.max(np.abs(_interior(out) - _interior(expected[:out.size]))) < 1e-4
+
+
+@pytest.mark.parametrize("orig_sr", [22050, 44100, 48000])
+def test_content_above_target_nyquist_is_filtered(orig_sr):
+    out = resample(_tone(10000, orig_sr), orig_sr)
+    assert np.max(np.abs(_interior(out))) < 1e-3
+
+
+def test_native_rate_is_returned_unchanged():
+    x = _tone(440, WHISPER_SAMPLE_RATE)
+    assert np.array_equal(resample(x, WHISPER_SAMPLE_RATE), x)
+    assert resample(np.zeros(0, np.float32), 44100).size == 0
+
+
+def test_odd_rates_use_bounded_ratio():
+    up, down = _ratio(WHISPER_SAMPLE_RATE, 44101)
+    assert up <= _MAX_RATIO_TERM and down <= _MAX_RATIO_TERM
+    assert abs(up / down - WHISPER_SAMPLE_RATE / 44101) / (WHISPER_SAMPLE_RATE / 44101) < 1e-4
+
+    out = resample(_tone(440, 44101), 44101)
+    assert abs(out.size - 0.5 * WHISPER_SAMPLE_RATE) <= 2
+
+
+def test_resample_rejects_non_positive_rates():
+    with pytest.raises(ValueError):
+        resample(np.zeros(10, np.float32), 0)
+
+
+@pytest.mark.parametrize("sample_format, raw, expected", [
+    ("s16le", np.array([-32768, 0, 16384], "<i2"), [-1.0, 0.0, 0.5]),
+    ("s32le", np.array([-2147483648, 0, 1073741824], "<i4"), [-1.0, 0.0, 0.5]),
+    ("f32le", np.array([-1.0, 0.0, 0.5], "<f4"), [-1.0, 0.0, 0.5]),
+    ("u8", np.array([0, 128, 192], "u1"), [-1.0, 0.0, 0.5]),
+])
+def test_pcm_formats_scale_to_unit_range(sample_format, raw, expected):
+    out = pcm_to_mono_float(raw.tobytes(), sample_format=sample_format)
+    assert out.dtype == np.float32
+    assert np.allclose(out, expected)
+
+
+def test_pcm_channels_are_averaged_and_partial_frames_dropped():
+    stereo = np.array([16384, -16384, 16384, 16384, 0], "<i2").tobytes()
+    assert np.allclose(pcm_to_mono_float(stereo, channels=2), [0.0, 0.5])
+    assert np.allclose(pcm_to_mono_float(memoryview(stereo[:3])), [0.5])
+
+
+def test_pcm_rejects_unknown_format_and_channels():
+    with pytest.raises(ValueError, match="Unsupported sample format"):
+        pcm_to_mono_float(b"\x00\x00", sample_format="s24le")
+    with pytest.raises(ValueError):
+        pcm_to_mono_float(b"\x00\x00", channels=0)
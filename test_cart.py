@@ -0,0 +1,81 @@
+"""
+Tests for batch cart operations against a temporary cart file.
+Run with: python -m pytest test_cart.py
+"""
+
+import json
+
+import pytest
+
+from app import cart
+from app.cart import MAX_ITEM_QUANTITY, apply_cart_operations, get_cart
+
+
+@pytest.fixture(autouse=True)
+def cart_file(tmp_path, monkeypatch):
+    path = tmp_path / "carts.json"
+    path.write_text("[]", encoding="utf-8")
+    monkeypatch.setattr(cart, "CART_FILE", path)
+    monkeypatch.setattr(cart, "LOCK_FILE", tmp_path / "carts.json.lock")
+    return path
+
+
+def _names():
+    return [item["name"] for item in get_cart()]
+
+
+def test_batch_applies_all_operations_in_order():
+    apply_cart_operations([
+        {"op": "add", "name": "Milk", "quantity": 2},
+        {"op": "add", "name": "bread"},
+        {"op": "set", "name": "tea", "quantity": 3},
+        {"op": "remove", "name": "milk", "quantity": 1},
+    ])
+    assert sorted(_names()) == ["bread", "milk", "tea", "tea", "tea"]
+
+
+def test_invalid_operation_rejects_whole_batch(cart_file):
+    apply_cart_operations([{"op": "add", "name": "milk"}])
+    before = cart_file.read_bytes()
+
+    with pytest.raises(ValueError, match="Operation 1"):
+        apply_cart_operations([
+            {"op": "add", "name": "bread"},
+            {"op": "explode", "name": "milk"},
+        ])
+    with pytest.raises(ValueError, match="not in the catalog"):
+        apply_cart_operations([{"op": "add", "name": "bread"}, {"op": "add", "name": "unicorn"}])
+
+    assert cart_file.read_bytes() == before
+
+
+def test_quantity_cap_on_add(cart_file):
+    with pytest.raises(ValueError):
+        apply_cart_operations([{"op": "add", "name": "milk", "quantity": 1_000_000_000}])
+
+    apply_cart_operations([{"op": "add", "name": "milk", "quantity": MAX_ITEM_QUANTITY - 1}])
+    before = cart_file.read_bytes()
+    with pytest.raises(ValueError, match=f"at most {MAX_ITEM_QUANTITY}"):
+        apply_cart_operations([{"op": "add", "name": "milk", "quantity": 2}])
+
+    assert cart_file.read_bytes() == before
+    assert len(get_cart()) == MAX_ITEM_QUANTITY - 1
+
+
+def test_reducing_drops_most_recently_added_units(cart_file):
+    cart_file.write_text(json.dumps([
+        {"name": "milk", "note": "first"},
+        {"name": "bread"},
+        {"name": "milk", "note": "second"},
+        {"name": "milk", "note": "third"},
+    ]), encoding="utf-8")
+
+    apply_cart_operations([{"op": "remove", "name": "milk", "quantity": 2}])
+
+    assert get_cart() == [{"name": "milk", "note": "first"}, {"name": "bread"}]
+
+
+def test_remove_without_quantity_removes_every_unit():
+    apply_cart_operations([{"op": "add", "name": "eggs", "quantity": 4}, {"op": "add", "name": "rice"}])
+    apply_cart_operations([{"op": "remove", "name": "eggs"}])
+    assert _names() == ["rice"]
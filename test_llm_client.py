@@ -0,0 +1,111 @@
+"""
+Tests for the pooled LLM client against a local OpenAI-compatible stub server.
+Run with: python -m pytest test_llm_client.py
+"""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.llm_client import LLMClient, LLMError
+
+
+class StubServer:
+    """Serves /chat/completions; each request pops the next (delay_s, status, reply) action."""
+
+    def __init__(self, actions, default=(0.0, 200, "ok")):
+        self.actions = list(actions)
+        self.default = default
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    delay, status, reply = stub.actions.pop(0) if stub.actions else stub.default
+                time.sleep(delay)
+                body = json.dumps({"choices": [{"message": {"content": reply}}]}).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # client gave up (timeout or hedge cancelled)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(actions, default=(0.0, 200, "ok")):
+        server = StubServer(actions, default)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def _client(server, **kwargs):
+    options = {"api_key": "test", "model": "stub", "base_url": server.url, "backoff_base": 0.01, "backoff_cap": 0.05}
+    options.update(kwargs)
+    return LLMClient(**options)
+
+
+def test_retries_on_503(stub):
+    server = stub([(0.0, 503, "unavailable"), (0.0, 200, "recovered")])
+    client = _client(server, max_retries=2)
+
+    assert client.invoke("hi").content == "recovered"
+    assert server.requests == 2
+    assert client.stats()["retries"] == 1
+
+
+def test_hedged_request_wins_over_straggler(stub):
+    server = stub([(1.5, 200, "slow"), (0.0, 200, "fast")])
+    client = _client(server, hedge=True, hedge_min_delay=0.1, timeout=5.0, attempt_timeout=5.0)
+    # Pretend recent calls were fast so the hedge delay is the 0.1 s minimum.
+    client._latencies.extend([0.01] * 20)
+
+    started = time.perf_counter()
+    assert client.invoke("hi").content == "fast"
+    assert time.perf_counter() - started < 1.0
+    stats = client.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_timed_out_attempts_are_retried_until_the_deadline(stub):
+    server = stub([], default=(2.0, 200, "too late"))
+    client = _client(server, timeout=0.8, attempt_timeout=0.25, max_retries=5)
+
+    started = time.perf_counter()
+    with pytest.raises(LLMError):
+        client.invoke("hi")
+    elapsed = time.perf_counter() - started
+
+    assert server.requests >= 2
+    assert client.stats()["retries"] >= 1
+    assert client.stats()["failures"] == 1
+    assert elapsed < 1.5